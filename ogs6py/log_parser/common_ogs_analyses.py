@@ -6,23 +6,117 @@
 #              http://www.opengeosys.org/project/license
 
 
+import functools
+from dataclasses import dataclass
+
 import pandas as pd
 import numpy as np
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+# Library grouping and aggregating the records in the analyses, see set_backend
+_backend = 'pandas'
+
+
+def set_backend(backend):
+    """Selects the library the analyses group and aggregate the records with, returns the previous.
+
+    'pandas' (default), 'arrow' (pyarrow) or 'polars', the latter two only if installed. The
+    records are handed over as Arrow arrays or a Polars lazy frame, the results are the same
+    pandas DataFrames (sums and means may differ in the last digit, as the order of summation
+    differs).
+    """
+    global _backend
+    if backend not in ('pandas', 'arrow', 'polars'):
+        raise Exception('Unknown analysis backend \'{}\''.format(backend))
+    if (backend == 'arrow' and pa is None) or (backend == 'polars' and pl is None):
+        raise Exception('The analysis backend \'{}\' is not installed'.format(backend))
+    previous, _backend = _backend, backend
+    return previous
+
+
+def _arrow_aggregate(df, index, aggregations):
+    def array(series):
+        if series.dtype == 'Int64':
+            return pa.array(series.to_numpy(dtype='int64', na_value=0), mask=series.isna().to_numpy())
+        return pa.array(series.to_numpy(dtype='float64', na_value=np.nan), from_pandas=True)
+
+    table = pa.table({column: array(df[column]) for column in [*index, *aggregations]})
+    valid = functools.reduce(pc.and_, [pc.is_valid(table[key]) for key in index])
+    # sums of groups without values are 0, as in pandas
+    options = {'sum': pc.ScalarAggregateOptions(min_count=0)}
+    result = table.filter(valid).group_by(index).aggregate(
+        [(column, f, options.get(f)) for column, f in aggregations.items()])
+    return {column: result[column].to_numpy(zero_copy_only=False) for column in index} | \
+        {column: result['{}_{}'.format(column, f)].to_numpy(zero_copy_only=False)
+         for column, f in aggregations.items()}
+
+
+def _polars_aggregate(df, index, aggregations):
+    columns = [*index, *aggregations]
+    frame = pl.LazyFrame({column: df[column].to_numpy(dtype='float64', na_value=np.nan) for column in columns},
+                         nan_to_null=True)
+    frame = frame.with_columns([pl.col(column).cast(pl.Int64) for column in columns if df[column].dtype == 'Int64'])
+    result = frame.drop_nulls(index).group_by(index).agg(
+        [getattr(pl.col(column), f)() for column, f in aggregations.items()]).collect()
+    return {column: result[column].to_numpy() for column in columns}
+
+
+def grouped_aggregate(df, index, aggregations):
+    """df.groupby(index).agg(aggregations) ('mean', 'sum' or 'max' per column) with the backend."""
+    if _backend == 'pandas':
+        return df.groupby(index).agg(aggregations)
+    aggregate = _arrow_aggregate if _backend == 'arrow' else _polars_aggregate
+    result = pd.DataFrame(aggregate(df, index, aggregations))
+    for column in index:
+        result[column] = result[column].astype(df[column].dtype)
+    for column, f in aggregations.items():
+        if f != 'mean':
+            result[column] = result[column].astype(df[column].dtype)
+        elif df[column].dtype == 'Int64':
+            result[column] = result[column].astype('Float64')
+    return result.sort_values(index).set_index(index)[list(aggregations)]
+
+
+def as_pivot_table(aggregated):
+    # What pivot_table does after grouping and aggregating
+    return aggregated.dropna(how='all').sort_index(axis=1).dropna(how='all', axis=1)
+
+
+def pivot_table(df, values, index, aggfunc='mean'):
+    """df.pivot_table(values, index, aggfunc=aggfunc) with the backend (see set_backend)."""
+    if _backend == 'pandas':
+        return df.pivot_table(values, index, aggfunc=aggfunc)
+    return as_pivot_table(grouped_aggregate(df, index, {value: aggfunc for value in values}))
+
 
 # Helper functions
+class MissingColumnsError(Exception):
+    """The table lacks the columns or values an analysis needs (see check_input, check_output)."""
+
+
 def check_input(df, interest, context):
     diff = set(interest) - set(df.columns)
     if diff:
-        raise Exception('Column(s) of interest ({}) is/are not present in table'.format(','.join(diff)))
+        raise MissingColumnsError('Column(s) of interest ({}) is/are not present in table'.format(','.join(diff)))
     diff = set(context) - set(df.columns)
     if diff:
-        raise Exception('Column(s) of context ({}) is/are not present in table', ','.format(','.join(diff)))
+        raise MissingColumnsError('Column(s) of context ({}) is/are not present in table'.format(','.join(diff)))
 
 
 def check_output(pt, interest, context):
     if pt.empty:
-        raise Exception(
+        raise MissingColumnsError(
             'The values of {} are not associated to all of {}. Call or see fill_ogs_context'.format(','.join(interest),
                                                                                                     ','.join(context)))
 
@@ -55,9 +149,9 @@ def analysis_time_step(df):
     context = ['mpi_process', 'time_step']
     check_input(df, interest, context)
 
-    dfe_ts = df.pivot_table(interest1, context)
+    dfe_ts = pivot_table(df, interest1, context)
     # accumulates coupling iterations and newton iterations
-    dfe_tsi = df.pivot_table(interest2, context, aggfunc='sum')
+    dfe_tsi = pivot_table(df, interest2, context, aggfunc='sum')
 
     dfe = dfe_ts.merge(dfe_tsi, left_index=True, right_index=True)
     check_output(dfe, interest, context)
@@ -69,13 +163,12 @@ def analysis_simulation(df):
     context = ['mpi_process']
     check_input(df, interest, context)
 
-    pt = df.pivot_table(interest, context)
+    pt = pivot_table(df, interest, context)
     check_output(pt, interest, context)
     return pt
 
 
 def analysis_convergence_newton_iteration(df):
-    dfe_newton_iteration = df.copy()
     interest = ['dx', 'x', 'dx_x']
     if 'coupling_iteration' in df:
         context = ['time_step', 'coupling_iteration', 'process',
@@ -84,19 +177,22 @@ def analysis_convergence_newton_iteration(df):
             context.append('component')
         check_input(df, interest, context)
         # Eliminate all entries for coupling iteration (not of interest in this study)
-        dfe_newton_iteration['coupling_iteration'] = dfe_newton_iteration.groupby('mpi_process')[
-            ['coupling_iteration']].fillna(method='bfill')
-        dfe_newton_iteration = dfe_newton_iteration[~dfe_newton_iteration['coupling_iteration_process'].notna()]
-        dfe_newton_iteration = dfe_newton_iteration.dropna(subset=['x'])
+        # Only the coupling_iteration column is filled, the frame is not copied
+        coupling_iteration = RankBlocks(df['mpi_process']).fill(df['coupling_iteration'], 'bfill')
+        rows = df['x'].notna()
+        # a chunk of the log (see analyse_chunks) may not contain any coupling iteration record
+        if 'coupling_iteration_process' in df:
+            rows &= df['coupling_iteration_process'].isna()
+        dfe_newton_iteration = df[rows].assign(coupling_iteration=coupling_iteration[rows])
 
-        pt = dfe_newton_iteration.pivot_table(interest, context)
+        pt = pivot_table(dfe_newton_iteration, interest, context)
 
     else:
         context = ['time_step', 'process', 'iteration_number']
         if 'component' in df.columns:
             context.append('component')
         check_input(df, interest, context)
-        pt = dfe_newton_iteration.pivot_table(interest, context)
+        pt = pivot_table(df, interest, context)
 
     check_output(pt, interest, context)
     return pt
@@ -105,21 +201,19 @@ def analysis_convergence_newton_iteration(df):
 @pre_post_check(interest=['dx', 'x', 'dx_x'],
                 context=['time_step', 'coupling_iteration', 'coupling_iteration_process'])
 def analysis_convergence_coupling_iteration(df):
-    # Coupling iteration column will be modified specific for coupling iteration analysis, modified data can not be used for other analysis ->copy!
-    dfe_convergence_coupling_iteration = df.copy()
     interest = ['dx', 'x', 'dx_x']
     context = ['time_step', 'coupling_iteration', 'coupling_iteration_process']
     if 'component' in df.columns:
         context.append('component')
     check_input(df, interest, context)
 
-    dfe_convergence_coupling_iteration['coupling_iteration'] = \
-        dfe_convergence_coupling_iteration.groupby('mpi_process')[['coupling_iteration']].fillna(method='ffill')
+    # Coupling iteration column is modified specific for coupling iteration analysis, only this column is filled
+    coupling_iteration = RankBlocks(df['mpi_process']).fill(df['coupling_iteration'], 'ffill')
     # All context log lines (iteration_number) have no values for dx, dx_x, x . From now on not needed -> dropped
-    dfe_convergence_coupling_iteration = dfe_convergence_coupling_iteration.dropna(
-        subset=['coupling_iteration_process']).dropna(subset=['x'])
+    rows = df['coupling_iteration_process'].notna() & df['x'].notna()
+    dfe_convergence_coupling_iteration = df[rows].assign(coupling_iteration=coupling_iteration[rows])
 
-    pt = dfe_convergence_coupling_iteration.pivot_table(interest, context)
+    pt = pivot_table(dfe_convergence_coupling_iteration, interest, context)
     check_output(pt, interest, context)
     return pt
 
@@ -128,11 +222,287 @@ def time_step_vs_iterations(df):
     interest = ['iteration_number']
     context = ['time_step']
     check_input(df, interest, context)
-    pt = df.pivot_table(["iteration_number"], ["time_step"], aggfunc=np.max)
+    pt = pivot_table(df, ["iteration_number"], ["time_step"], aggfunc='max')
+    check_output(pt, interest, context)
+    return pt
+
+
+'''
+Analysis of where the wall time of each time step went. The time of a time step (TimeStepFinishedTime) is split into
+the accumulated assembly, linear solver and Dirichlet times and the overhead not accounted by them (e.g. the nonlinear
+loop, the evaluation of the convergence criteria, time step control). Output is written after the time step has
+finished, it is added to the total. Rejected and repeated time steps are accumulated in the time step.
+'''
+
+performance_components = ['assembly_time', 'linear_solver_time', 'dirichlet_time', 'output_time', 'overhead_time']
+
+
+def analysis_performance_breakdown(df):
+    interest = ['time_step_finished_time', 'assembly_time', 'linear_solver_time', 'dirichlet_time', 'output_time']
+    context = ['mpi_process', 'time_step']
+    check_input(df, interest, context)
+
+    pt = pivot_table(df, interest, context, aggfunc='sum')
+    # time steps that were not finished (e.g. time step 0, only output) have no breakdown
+    finished = pivot_table(df, ['time_step_finished_time'], context, aggfunc='max')
+    pt = pt[interest][pt.index.isin(finished.index)]
+    accounted = pt['assembly_time'] + pt['linear_solver_time'] + pt['dirichlet_time']
+    pt['overhead_time'] = pt['time_step_finished_time'] - accounted
+    pt['total_time'] = pt['time_step_finished_time'] + pt['output_time']
+    check_output(pt, interest, context)
+    return pt
+
+
+@dataclass
+class PerformanceReport:
+    """Summary of `analysis_performance_breakdown`.
+
+    totals: seconds and share of the total time per component (mean over mpi_processes),
+    top_time_steps: the most expensive time steps (by total_time),
+    percentiles: of the time per time step of each component.
+    """
+    breakdown: pd.DataFrame
+    totals: pd.DataFrame
+    top_time_steps: pd.DataFrame
+    percentiles: pd.DataFrame
+
+    def __str__(self):
+        return 'Time per component\n{}\n\nMost expensive time steps\n{}\n\nPercentiles per time step\n{}'.format(
+            self.totals.to_string(), self.top_time_steps.to_string(), self.percentiles.to_string())
+
+
+def performance_report(df, top=10, percentiles=(0.5, 0.9, 0.99)):
+    """PerformanceReport of a context filled frame (or of an analysis_performance_breakdown)."""
+    breakdown = df if 'overhead_time' in df else analysis_performance_breakdown(df)
+    seconds = breakdown[performance_components].groupby(level='mpi_process').sum().mean()
+    totals = pd.DataFrame({'seconds': seconds, 'share': seconds / seconds.sum()})
+    totals.loc['total_time'] = [seconds.sum(), 1.0]
+    top_time_steps = breakdown.nlargest(top, 'total_time')
+    quantiles = breakdown[[*performance_components, 'total_time']].quantile(list(percentiles))
+    quantiles.loc['max'] = breakdown[[*performance_components, 'total_time']].max()
+    quantiles.index.name = 'percentile'
+    return PerformanceReport(breakdown, totals, top_time_steps, quantiles)
+
+
+'''
+Analysis of the load balance of parallel runs. The n-th assembly (linear solver, iteration) of a time step of each
+mpi_process is synchronized with the n-th of the others, so its wall time is the maximum over the mpi_processes, with
+a perfect balance it would be the mean. Per time step and phase: the wall time (max) and balanced time (mean) summed
+over the phases of the time step, their ratio (imbalance), the wall time lost to waiting for the slowest mpi_process
+(wait = max - mean) and the mpi_process with the largest time in the time step (slowest_rank).
+'''
+
+mpi_phases = ['assembly_time', 'linear_solver_time', 'iteration_time']
+
+
+def analysis_mpi_imbalance(df):
+    interest = mpi_phases
+    context = ['mpi_process', 'time_step']
+    check_input(df, interest, context)
+
+    columns = {}
+    for phase in interest:
+        rows = df.loc[df[phase].notna(), ['mpi_process', 'time_step', phase]]
+        occurrence = rows.groupby(['mpi_process', 'time_step']).cumcount().rename('occurrence')
+        synchronized = rows[phase].groupby([rows['time_step'], occurrence]).agg(['max', 'mean'])
+        per_time_step = synchronized.groupby(level='time_step').sum()
+        per_rank = rows.groupby(['time_step', 'mpi_process'])[phase].sum().unstack()
+        columns[phase + '_max'] = per_time_step['max']
+        columns[phase + '_mean'] = per_time_step['mean']
+        columns[phase + '_imbalance'] = per_time_step['max'] / per_time_step['mean']
+        columns[phase + '_wait'] = per_time_step['max'] - per_time_step['mean']
+        columns[phase + '_slowest_rank'] = per_rank.idxmax(axis=1).astype('Int64')
+    pt = pd.DataFrame(columns)
+    pt.index.name = 'time_step'
+    check_output(pt, interest, context)
+    return pt
+
+
+@dataclass
+class MPIImbalanceReport:
+    """Summary of `analysis_mpi_imbalance` per phase.
+
+    summary: imbalance (wall time / balanced time of the run), max_imbalance (of a time step),
+    wait_time (sum over the time steps), wait_share (of the wall time of the phase), the most
+    frequent slowest_rank and its frequency (share of the time steps),
+    slowest_rank_frequency: share of the time steps each mpi_process was the slowest.
+    """
+    per_time_step: pd.DataFrame
+    summary: pd.DataFrame
+    slowest_rank_frequency: pd.DataFrame
+
+    def __str__(self):
+        return 'Load imbalance per phase\n{}\n\nSlowest mpi_process frequency\n{}'.format(
+            self.summary.to_string(), self.slowest_rank_frequency.to_string())
+
+
+def mpi_imbalance_report(df):
+    """MPIImbalanceReport of a context filled frame (or of an analysis_mpi_imbalance)."""
+    per_time_step = df if 'assembly_time_wait' in df else analysis_mpi_imbalance(df)
+    summary = {}
+    frequency = {}
+    for phase in mpi_phases:
+        wall_time = per_time_step[phase + '_max'].sum()
+        frequency[phase] = per_time_step[phase + '_slowest_rank'].value_counts(normalize=True)
+        summary[phase] = {'imbalance': wall_time / per_time_step[phase + '_mean'].sum(),
+                          'max_imbalance': per_time_step[phase + '_imbalance'].max(),
+                          'wait_time': per_time_step[phase + '_wait'].sum(),
+                          'wait_share': per_time_step[phase + '_wait'].sum() / wall_time,
+                          'slowest_rank': frequency[phase].idxmax(),
+                          'slowest_rank_frequency': frequency[phase].max()}
+    slowest_rank_frequency = pd.DataFrame(frequency).fillna(0.0).astype('float64').sort_index()
+    slowest_rank_frequency.index.name = 'mpi_process'
+    return MPIImbalanceReport(per_time_step, pd.DataFrame.from_dict(summary, orient='index'),
+                              slowest_rank_frequency)
+
+
+'''
+Analysis of the convergence of the nonlinear solver. For each sequence of newton iterations (of a time step, attempt,
+coupling iteration, process and component) the contraction factors q_k = e_k / e_k-1 and the observed orders
+p_k = log(e_k / e_k-1) / log(e_k-1 / e_k-2) of the errors e = |dx|/|x| are estimated. A sequence is diverging if the
+error grew in the last iteration, stagnating if it was reduced by less than the factor `stagnation`, linear if the
+median order is below `superlinear` and superlinear otherwise; with fewer than 3 iterations the order is undetermined.
+Diverging, stagnating and linear sequences with a median contraction above `linear_contraction` are flagged, they take
+many iterations (e.g. because of a bad Jacobian or damping).
+The convergence criteria are the same on all mpi_processes, those of the first are used.
+'''
+
+
+def analysis_convergence_order(df, stagnation=0.9, superlinear=1.3, linear_contraction=0.1):
+    interest = ['dx_x', 'iteration_number']
+    context = ['time_step', 'process']
+    check_input(df, interest, context)
+
+    rows = df['x'].notna() & (df['mpi_process'] == df['mpi_process'].min())
+    keys = ['time_step', 'process']
+    if 'coupling_iteration' in df:
+        coupling_iteration = RankBlocks(df['mpi_process']).fill(df['coupling_iteration'], 'bfill')
+        if 'coupling_iteration_process' in df:
+            rows &= df['coupling_iteration_process'].isna()
+        dfe = df.loc[rows, ['time_step', 'process', 'iteration_number', 'dx_x']].assign(
+            coupling_iteration=coupling_iteration[rows])
+        keys.insert(1, 'coupling_iteration')
+    else:
+        dfe = df.loc[rows, ['time_step', 'process', 'iteration_number', 'dx_x']]
+    if 'component' in df:
+        dfe['component'] = df.loc[rows, 'component']
+        keys.append('component')
+
+    # a rejected time step is repeated: the iteration numbers start again, in a new attempt
+    restart = dfe.groupby(keys)['iteration_number'].diff().fillna(1) <= 0
+    dfe['attempt'] = restart.groupby([dfe[key] for key in keys]).cumsum().astype('Int64')
+    keys.insert(1, 'attempt')
+    error = dfe['dx_x'].where(dfe['dx_x'] > 0)
+    sequences = error.groupby([dfe[key] for key in keys])
+    previous = sequences.shift(1)
+    dfe['contraction'] = error / previous
+    dfe['order'] = np.log(dfe['contraction']) / np.log(previous / sequences.shift(2))
+
+    grouped = dfe.groupby(keys)
+    pt = pd.DataFrame({'iterations': grouped['iteration_number'].count(),
+                       'dx_x_first': grouped['dx_x'].first(),
+                       'dx_x_last': grouped['dx_x'].last(),
+                       'contraction': grouped['contraction'].median(),
+                       'last_contraction': grouped['contraction'].last(),
+                       'order': grouped['order'].median()})
+    convergence = np.select([pt['last_contraction'] > 1, pt['last_contraction'] >= stagnation, pt['order'].isna(),
+                             pt['order'] < superlinear],
+                            ['diverging', 'stagnating', 'undetermined', 'linear'], 'superlinear')
+    pt['convergence'] = pd.Categorical(convergence, categories=['superlinear', 'linear', 'stagnating', 'diverging',
+                                                                'undetermined'])
+    pt['flagged'] = pt['convergence'].isin(['diverging', 'stagnating']) | (
+            (pt['convergence'] == 'linear') & (pt['contraction'] > linear_contraction))
+    check_output(pt, interest, context)
+    return pt
+
+
+'''
+Analysis of the compute spent on rejected time steps. A time step that is rejected (e.g. after the nonlinear solver
+diverged) is repeated with a smaller step size under the same time step number. The attempts are told apart by the
+starts of the time step (TimeStepStartTime), an attempt is rejected if the time step is started again or if a
+warning of its rejection is logged in it (the last attempt of an aborted simulation).
+'''
+
+attempt_costs = ['assembly_time', 'linear_solver_time', 'dirichlet_time', 'iteration_time', 'time_step_finished_time']
+
+
+def time_step_attempts(df):
+    """The attempt of the time step of each row of a context filled frame: 0 for the first, n for
+    the n-th repetition."""
+    starts = df['step_start_time'].notna()
+    attempt = pd.Series(pd.NA, index=df.index, dtype='Int64')
+    attempt[starts] = df.loc[starts].groupby(['mpi_process', 'time_step']).cumcount().to_numpy()
+    return RankBlocks(df['mpi_process']).fill(attempt, 'ffill').fillna(0)
+
+
+def analysis_time_step_attempts(df):
+    interest = attempt_costs
+    context = ['mpi_process', 'time_step', 'step_start_time']
+    check_input(df, interest, context)
+
+    attempt = time_step_attempts(df).rename('attempt')
+    keys = [df['mpi_process'], df['time_step'], attempt]
+    grouped = df[interest].groupby(keys)
+    pt = grouped.sum()
+    pt['iterations'] = grouped['iteration_time'].count()
+    pt['finished'] = grouped['time_step_finished_time'].count() > 0
+    # attempts without 'Time step #n took' (e.g. aborted by an error) take the time of their
+    # iterations, or of assembly, linear solver and Dirichlet BCs if no iteration finished
+    unfinished = ~pt['finished']
+    solve_time = pt[['assembly_time', 'linear_solver_time', 'dirichlet_time']].sum(axis=1)
+    pt.loc[unfinished, 'time_step_finished_time'] = pt['iteration_time'].where(pt['iteration_time'] > 0,
+                                                                               solve_time)[unfinished]
+    # attempts without any costs (e.g. time step 0, only output) are left out
+    pt = pt[pt['finished'] | (pt['time_step_finished_time'] > 0)]
+    repeated = pt.index.get_level_values('attempt') < pt.groupby(level=['mpi_process', 'time_step']).transform(
+        'size').to_numpy() - 1
+    if 'message' in df:
+        warned = df['message'].str.contains(r'Time step (?:will be|\d+ was) rejected', na=False)
+        warned = warned.groupby(keys).any().reindex(pt.index, fill_value=False).to_numpy()
+    else:
+        warned = False
+    pt['rejected'] = repeated | warned
     check_output(pt, interest, context)
     return pt
 
 
+def analysis_wasted_compute(df):
+    """The costs of the rejected attempts of each time step (see analysis_time_step_attempts)."""
+    attempts = df if 'rejected' in df else analysis_time_step_attempts(df)
+    rejected = attempts[attempts['rejected']]
+    pt = rejected[[*attempt_costs, 'iterations']].groupby(level=['mpi_process', 'time_step']).sum()
+    pt['rejected_attempts'] = rejected.groupby(level=['mpi_process', 'time_step']).size()
+    return pt
+
+
+@dataclass
+class WastedComputeReport:
+    """Summary of `analysis_time_step_attempts`.
+
+    per_attempt: costs of each attempt of each time step, per_time_step: the costs of the
+    rejected attempts (analysis_wasted_compute), totals: wasted (rejected) and total seconds
+    and iterations and the wasted share, per cost (mean over the mpi_processes).
+    """
+    per_attempt: pd.DataFrame
+    per_time_step: pd.DataFrame
+    totals: pd.DataFrame
+
+    def __str__(self):
+        return 'Compute of rejected time steps\n{}\n\nPer time step\n{}'.format(
+            self.totals.to_string(), self.per_time_step.to_string())
+
+
+def wasted_compute_report(df):
+    """WastedComputeReport of a context filled frame (or of an analysis_time_step_attempts)."""
+    per_attempt = df if 'rejected' in df else analysis_time_step_attempts(df)
+    costs = [*attempt_costs, 'iterations']
+    ranks = per_attempt.index.get_level_values('mpi_process').nunique()
+    total = per_attempt[costs].sum() / ranks
+    wasted = per_attempt.loc[per_attempt['rejected'], costs].sum() / ranks
+    totals = pd.DataFrame({'wasted': wasted, 'total': total, 'share': wasted / total})
+    return WastedComputeReport(per_attempt, analysis_wasted_compute(per_attempt), totals)
+
+
 def analysis_simulation_termination(df):
     # For full print of messages consider setup jupyter notebook:
     # pd.set_option('display.max_colwidth', None)
@@ -149,15 +519,83 @@ def analysis_simulation_termination(df):
         return pd.DataFrame()
 
 
+# Columns of interest and context of each analysis, including those fill_ogs_context derives
+# them from; parsing can be restricted to the record types providing them (see
+# log_parser.analysis_record_types)
+analysis_columns = {
+    analysis_time_step: ['output_time', 'time_step_solution_time', 'step_size', 'assembly_time',
+                         'linear_solver_time', 'dirichlet_time', 'time_step'],
+    analysis_simulation: ['execution_time'],
+    analysis_performance_breakdown: ['time_step_finished_time', 'assembly_time', 'linear_solver_time',
+                                     'dirichlet_time', 'output_time', 'time_step'],
+    analysis_mpi_imbalance: ['assembly_time', 'linear_solver_time', 'iteration_time', 'time_step'],
+    analysis_time_step_attempts: [*attempt_costs, 'step_start_time', 'message', 'time_step'],
+    analysis_wasted_compute: [*attempt_costs, 'step_start_time', 'message', 'time_step'],
+    analysis_convergence_order: ['dx', 'x', 'dx_x', 'time_step', 'coupling_iteration', 'coupling_iteration_process',
+                                 'process', 'iteration_number', 'component'],
+    analysis_convergence_newton_iteration: ['dx', 'x', 'dx_x', 'time_step', 'coupling_iteration',
+                                            'coupling_iteration_process', 'process', 'iteration_number',
+                                            'component'],
+    analysis_convergence_coupling_iteration: ['dx', 'x', 'dx_x', 'time_step', 'coupling_iteration',
+                                              'coupling_iteration_process', 'component'],
+    time_step_vs_iterations: ['iteration_number', 'time_step'],
+    analysis_simulation_termination: ['message'],
+}
+
+class RankBlocks:
+    """The rows of a frame (stably) sorted into one block per mpi_process, for fills within blocks.
+
+    Each fill is an accumulation over the positions of the rows with a value, clipped to the
+    block of the row, instead of a groupby('mpi_process') per column.
+    """
+
+    def __init__(self, mpi_process):
+        ranks = pd.factorize(mpi_process, use_na_sentinel=False)[0]
+        self.order = np.argsort(ranks, kind='stable') if len(ranks) and ranks.max() > 0 else None
+        sorted_ranks = ranks if self.order is None else ranks[self.order]
+        new_block = np.concatenate([[True], sorted_ranks[1:] != sorted_ranks[:-1]]) if len(ranks) else ranks
+        block_start = np.flatnonzero(new_block)
+        block_end = np.append(block_start[1:], len(ranks)) - 1
+        block = np.cumsum(new_block) - 1
+        self.start, self.end = block_start[block], block_end[block]
+
+    def _sources(self, valid, method):
+        # Position of the row each row is filled from (itself if valid), -1 if there is none in its block
+        positions = np.arange(len(valid))
+        if method == 'ffill':
+            sources = np.maximum.accumulate(np.where(valid, positions, -1))
+            sources[sources < self.start] = -1
+        elif method == 'bfill':
+            sources = np.minimum.accumulate(np.where(valid, positions, len(valid))[::-1])[::-1]
+            sources[sources > self.end] = -1
+        else:
+            # forward fill with limit=1: only from the directly preceding row of the block
+            previous = np.concatenate([[False], valid[:-1]]) & (positions > self.start)
+            sources = np.where(valid, positions, np.where(previous, positions - 1, -1))
+        return sources
+
+    def fill(self, series, method):
+        """Like series.groupby(mpi_process).fillna(method=method), 'ffill_once' for limit=1."""
+        valid = series.notna().to_numpy()
+        if self.order is None:
+            sources = self._sources(valid, method)
+        else:
+            sources = np.empty(len(valid), dtype=np.int64)
+            sorted_sources = self._sources(valid[self.order], method)
+            sources[self.order] = np.where(sorted_sources >= 0, self.order[np.maximum(sorted_sources, 0)], -1)
+        return pd.Series(pd.api.extensions.take(series.array, sources, allow_fill=True), index=series.index,
+                         name=series.name)
+
+
 def fill_ogs_context(df):
     # Some columns that contain actual integer values are converted to float
     # See https://pandas.pydata.org/pandas-docs/stable/user_guide/integer_na.html
-    # ToDo list of columns with integer values are known from regular expression
+    # Frames from parse_file_to_dataframe already carry Int64 columns and are not converted again
 
     int_columns = ['line', 'mpi_process', 'time_step', 'iteration_number', 'coupling_iteration',
                    'coupling_iteration_process', 'component', 'process']
     for column in df.columns:
-        if column in int_columns:
+        if column in int_columns and df[column].dtype != 'Int64':
             try:
                 df[column] = df[column].astype('Int64')
             except:
@@ -165,24 +603,176 @@ def fill_ogs_context(df):
 
     # Some logs do not contain information about time_step and iteration
     # The information must be collected by context (by surrounding log lines from same mpi_process)
-    # Logs are grouped by mpi_process to get only surrounding log lines from same mpi_process
+    # Logs are grouped by mpi_process to get only surrounding log lines from same mpi_process,
+    # in a single sort for all columns (see RankBlocks)
+    blocks = RankBlocks(df['mpi_process'])
+
+    def fill(column, method):
+        return blocks.fill(df[column], method)
 
     # There are log lines that give the current time step (when time step starts).
     # It can be assumed that in all following lines belong to this time steps, until next collected value of time step
-    df['time_step'] = df.groupby('mpi_process')[['time_step']].fillna(method='ffill').fillna(value=0)
+    df['time_step'] = fill('time_step', 'ffill').fillna(value=0)
 
     # Back fill, because iteration number can be found in logs at the END of the iteration
-    df['iteration_number'] = df.groupby('mpi_process')[['iteration_number']].fillna(method='bfill')
+    df['iteration_number'] = fill('iteration_number', 'bfill')
 
     # ToDo Comment
     if 'component' in df:
-        df['component'] = df.groupby('mpi_process')[['component']].fillna(value=-1)
+        df['component'] = df['component'].fillna(value=-1)
     # Forward fill because process will be printed in the beginning - applied to all subsequent
     if 'process' in df:
-        df['process'] = df.groupby('mpi_process')[['process']].fillna(method='bfill')
+        df['process'] = fill('process', 'bfill')
     # Attention - coupling iteration applies to successor line and to all other predecessors - it needs further processing for specific analysis
     if 'coupling_iteration_process' in df:
-        df['coupling_iteration_process'] = df.groupby('mpi_process')[['coupling_iteration_process']].fillna(
-            method='ffill',
-            limit=1)
+        df['coupling_iteration_process'] = fill('coupling_iteration_process', 'ffill_once')
     return df
+
+
+class ContextFiller:
+    """Applies `fill_ogs_context` to a log that arrives as consecutive frames (see `iter_records`).
+
+    Rows are held back until their context is complete: iteration_number and process are back
+    filled, so a row waits for a later row of its mpi_process carrying these values. The forward
+    filled time_step and coupling_iteration_process are carried over per mpi_process. With
+    align_time_steps rows are only released for time steps that all mpi_processes have left, so
+    analyses grouping by time step can be applied to each released frame on its own.
+    Concatenating all released frames (push ... flush) gives fill_ogs_context of the whole log,
+    except that `component` only exists (and is filled with -1) from the first frame containing it.
+    """
+
+    def __init__(self, align_time_steps=True):
+        self.align_time_steps = align_time_steps
+        self.dtypes = {}
+        self.pending = None
+        self.released_rows = 0
+        # mpi_process -> (filled time_step, coupling_iteration_process) of its last released row
+        self.carry = {}
+
+    def push(self, df):
+        for column, dtype in df.dtypes.items():
+            self.dtypes.setdefault(column, dtype)
+        if self.pending is None or self.pending.empty:
+            self.pending = df.reset_index(drop=True)
+        else:
+            self.pending = pd.concat([self.pending, df], ignore_index=True)
+        return self._release(final=False)
+
+    def flush(self):
+        return self._release(final=True)
+
+    def _release(self, final):
+        columns = list(self.dtypes) + [c for c in ['time_step', 'iteration_number'] if c not in self.dtypes]
+        if self.pending is None or self.pending.empty:
+            return pd.DataFrame(columns=columns)
+        raw = self.pending
+        work = raw.copy()
+        for column in columns:
+            if column not in work:
+                work[column] = pd.Series(index=work.index, dtype=self.dtypes.get(column, 'Int64'))
+        df = fill_ogs_context(work[columns])
+
+        ranks = df['mpi_process'].to_numpy()
+        time_step_known = work['time_step'].notna().to_numpy()
+        for rank, (time_step, coupling_iteration_process) in self.carry.items():
+            of_rank = ranks == rank
+            # rows before the first time_step of this mpi_process continue the carried time step
+            before = of_rank & (np.cumsum(time_step_known & of_rank) == 0)
+            df.loc[before, 'time_step'] = time_step
+            if 'coupling_iteration_process' in df and not pd.isna(coupling_iteration_process):
+                first = np.flatnonzero(of_rank)[:1]
+                if len(first) and pd.isna(work['coupling_iteration_process'].iat[first[0]]):
+                    df.loc[first, 'coupling_iteration_process'] = coupling_iteration_process
+
+        release = np.ones(len(df), dtype=bool)
+        if not final:
+            reversed_ranks = ranks[::-1]
+            for column in ['iteration_number', 'process']:
+                known = work[column].notna() if column in work else pd.Series(False, index=work.index)
+                # number of rows of the same mpi_process at or after each row that carry a value
+                later = known[::-1].astype(int).groupby(reversed_ranks).cumsum()[::-1]
+                release &= (later > 0).to_numpy()
+        # Only a leading block of rows is released, to keep the order of the log
+        release = np.logical_and.accumulate(release)
+        if self.align_time_steps and not final:
+            time_steps = df['time_step'].to_numpy(dtype=np.int64)
+            latest = df.groupby('mpi_process')['time_step'].max().to_dict()
+            for rank, (time_step, _) in self.carry.items():
+                latest.setdefault(rank, time_step)
+            release &= time_steps < min(latest.values())
+            release = np.logical_and.accumulate(release)
+            # no time step may be split between released and held back rows
+            while not release.all():
+                aligned = np.logical_and.accumulate(release & (time_steps < time_steps[~release].min()))
+                if (aligned == release).all():
+                    break
+                release = aligned
+        released_positions = np.flatnonzero(release)
+        last_positions = pd.Series(released_positions).groupby(ranks[released_positions]).last()
+        for rank, position in last_positions.items():
+            coupling_iteration_process = (work['coupling_iteration_process'].iat[position]
+                                          if 'coupling_iteration_process' in work else pd.NA)
+            self.carry[rank] = (df['time_step'].iat[position], coupling_iteration_process)
+
+        released = df[release]
+        self.pending = raw[~release].reset_index(drop=True)
+        released.index = pd.RangeIndex(self.released_rows, self.released_rows + len(released))
+        self.released_rows += len(released)
+        return released
+
+
+def iter_fill_ogs_context(frames, align_time_steps=True):
+    """Context filled frames for a stream of record frames, see `ContextFiller`."""
+    filler = ContextFiller(align_time_steps)
+    for frame in frames:
+        released = filler.push(frame)
+        if not released.empty:
+            yield released
+    released = filler.flush()
+    if not released.empty:
+        yield released
+
+
+def analyse_chunks(frames, analysis):
+    """Applies an analysis grouped by time step to each time step aligned frame of
+    `iter_fill_ogs_context` and combines the results.
+
+    Frames that do not contain any values of interest for the analysis (e.g. only the log
+    preamble, see `MissingColumnsError`) are skipped, other errors are raised.
+    """
+    results = []
+    error = None
+    for frame in frames:
+        try:
+            results.append(analysis(frame))
+        except MissingColumnsError as e:
+            error = e
+    if not results:
+        if error is not None:
+            raise error
+        return pd.DataFrame()
+    # frames lacking some values of interest give fewer columns, keep those of the most complete
+    columns = list(max(results, key=lambda result: len(result.columns)).columns)
+    for result in results:
+        columns += [column for column in result.columns if column not in columns]
+    return pd.concat(results)[columns].sort_index()
+
+
+def analyse_runs(df, analysis):
+    """Applies an analysis to each run of a frame of `log_parser.parse_logs`.
+
+    The results are combined with `run_id` as first index level. Runs the analysis can not be
+    applied to (e.g. no coupling iterations in the log, see `MissingColumnsError`) are left
+    out and listed with the reason in `attrs['errors']` of the result, together with the runs
+    that could not be parsed (`attrs['errors']` of df). Other errors are raised.
+    """
+    results = {}
+    errors = dict(df.attrs.get('errors', {}))
+    for run_id, run in df.groupby(level='run_id', sort=False):
+        try:
+            results[run_id] = analysis(run.droplevel('run_id'))
+        except MissingColumnsError as e:
+            errors[run_id] = repr(e)
+    pt = pd.concat(results, names=['run_id']) if results else pd.DataFrame()
+    pt.attrs['errors'] = errors
+    return pt
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012-2022, OpenGeoSys Community (http://www.opengeosys.org)
+#            Distributed under a Modified BSD License.
+#              See accompanying file LICENSE.txt or
+#              http://www.opengeosys.org/project/license
+
+from functools import cached_property
+
+from ogs6py.log_parser.common_ogs_analyses import RankBlocks, check_input, check_output, fill_ogs_context, \
+    analysis_simulation, analysis_simulation_termination, analysis_performance_breakdown, analysis_mpi_imbalance, \
+    analysis_convergence_order, analysis_time_step_attempts, analysis_wasted_compute, grouped_aggregate, as_pivot_table, pivot_table
+from ogs6py.log_parser.log_parser import parse_file_to_dataframe
+
+
+class LogAnalysis:
+    """The analyses of `common_ogs_analyses` for one log, from a single parse.
+
+    The log is parsed (through `cache` if given, see `ParseCache`) and context filled once, on
+    first use. Each analysis is computed on first access and kept. The time step analyses share
+    one groupby over (mpi_process, time_step), the convergence analyses share the convergence
+    criterion rows and the filled coupling iterations. The results equal those of the analysis
+    functions on `fill_ogs_context(parse_file_to_dataframe(file_name))`.
+    """
+
+    filters = {'by_time_step': 'time_step',
+               'convergence_newton_iteration': 'convergence_newton_iteration',
+               'convergence_coupling_iteration': 'convergence_coupling_iteration',
+               'time_step_vs_iterations': 'time_step_vs_iterations',
+               'analysis_simulation': 'simulation',
+               'performance_breakdown': 'performance_breakdown',
+               'mpi_imbalance': 'mpi_imbalance',
+               'convergence_order': 'convergence_order',
+               'time_step_attempts': 'time_step_attempts',
+               'wasted_compute': 'wasted_compute',
+               'fill_ogs_context': 'df'}
+
+    def __init__(self, file_name=None, df=None, cache=None, workers=None):
+        if (file_name is None) == (df is None):
+            raise Exception('Either a log file or a context filled DataFrame is needed')
+        self.file_name = file_name
+        self.cache = cache
+        self.workers = workers
+        if df is not None:
+            self.df = df
+
+    @cached_property
+    def df(self):
+        return fill_ogs_context(parse_file_to_dataframe(self.file_name, workers=self.workers, cache=self.cache))
+
+    def __getitem__(self, filter):
+        """The analysis for a filter name of `OGS.parse_out`, e.g. 'by_time_step'."""
+        if filter not in self.filters:
+            raise KeyError('Filter not available: {}'.format(filter))
+        return getattr(self, self.filters[filter])
+
+    @cached_property
+    def _time_step_groups(self):
+        columns = {'output_time': 'mean', 'time_step_solution_time': 'mean', 'step_size': 'mean',
+                   'assembly_time': 'sum', 'linear_solver_time': 'sum', 'dirichlet_time': 'sum',
+                   'iteration_number': 'max'}
+        return grouped_aggregate(self.df, ['mpi_process', 'time_step'],
+                                 {column: aggregation for column, aggregation in columns.items() if column in self.df})
+
+    @cached_property
+    def time_step(self):
+        """analysis_time_step"""
+        interest1 = ['output_time', 'time_step_solution_time', 'step_size']
+        interest2 = ['assembly_time', 'linear_solver_time', 'dirichlet_time']
+        interest = [*interest1, *interest2]
+        context = ['mpi_process', 'time_step']
+        check_input(self.df, interest, context)
+        dfe_ts = as_pivot_table(self._time_step_groups[interest1])
+        dfe_tsi = as_pivot_table(self._time_step_groups[interest2])
+        dfe = dfe_ts.merge(dfe_tsi, left_index=True, right_index=True)
+        check_output(dfe, interest, context)
+        return dfe
+
+    @cached_property
+    def time_step_vs_iterations(self):
+        """time_step_vs_iterations"""
+        interest = ['iteration_number']
+        context = ['time_step']
+        check_input(self.df, interest, context)
+        pt = as_pivot_table(self._time_step_groups[interest].groupby(level='time_step').max())
+        check_output(pt, interest, context)
+        return pt
+
+    @cached_property
+    def _convergence_rows(self):
+        # rows with a convergence criterion and the coupling iteration of the rows after (newton
+        # iterations) and before them (coupling iterations), filled per mpi_process
+        df = self.df
+        rows = df[df['x'].notna()] if 'x' in df else df.iloc[:0]
+        if 'coupling_iteration' not in df:
+            return rows, None, None
+        blocks = RankBlocks(df['mpi_process'])
+        next_coupling_iteration = blocks.fill(df['coupling_iteration'], 'bfill')[rows.index]
+        previous_coupling_iteration = blocks.fill(df['coupling_iteration'], 'ffill')[rows.index]
+        return rows, next_coupling_iteration, previous_coupling_iteration
+
+    @cached_property
+    def convergence_newton_iteration(self):
+        """analysis_convergence_newton_iteration"""
+        df = self.df
+        interest = ['dx', 'x', 'dx_x']
+        if 'coupling_iteration' in df:
+            context = ['time_step', 'coupling_iteration', 'process', 'iteration_number']
+            if 'component' in df.columns:
+                context.append('component')
+            check_input(df, interest, context)
+            rows, next_coupling_iteration, _ = self._convergence_rows
+            newton_rows = rows['coupling_iteration_process'].isna()
+            dfe_newton_iteration = rows[newton_rows].assign(
+                coupling_iteration=next_coupling_iteration[newton_rows])
+            pt = pivot_table(dfe_newton_iteration, interest, context)
+        else:
+            context = ['time_step', 'process', 'iteration_number']
+            if 'component' in df.columns:
+                context.append('component')
+            check_input(df, interest, context)
+            pt = pivot_table(df, interest, context)
+        check_output(pt, interest, context)
+        return pt
+
+    @cached_property
+    def convergence_coupling_iteration(self):
+        """analysis_convergence_coupling_iteration"""
+        interest = ['dx', 'x', 'dx_x']
+        context = ['time_step', 'coupling_iteration', 'coupling_iteration_process']
+        if 'component' in self.df.columns:
+            context.append('component')
+        check_input(self.df, interest, context)
+        rows, _, previous_coupling_iteration = self._convergence_rows
+        coupling_rows = rows['coupling_iteration_process'].notna()
+        dfe_convergence_coupling_iteration = rows[coupling_rows].assign(
+            coupling_iteration=previous_coupling_iteration[coupling_rows])
+        pt = pivot_table(dfe_convergence_coupling_iteration, interest, context)
+        check_output(pt, interest, context)
+        return pt
+
+    @cached_property
+    def performance_breakdown(self):
+        """analysis_performance_breakdown"""
+        return analysis_performance_breakdown(self.df)
+
+    @cached_property
+    def mpi_imbalance(self):
+        """analysis_mpi_imbalance"""
+        return analysis_mpi_imbalance(self.df)
+
+    @cached_property
+    def convergence_order(self):
+        """analysis_convergence_order"""
+        return analysis_convergence_order(self.df)
+
+    @cached_property
+    def time_step_attempts(self):
+        """analysis_time_step_attempts"""
+        return analysis_time_step_attempts(self.df)
+
+    @cached_property
+    def wasted_compute(self):
+        """analysis_wasted_compute"""
+        return analysis_wasted_compute(self.time_step_attempts)
+
+    @cached_property
+    def simulation(self):
+        """analysis_simulation"""
+        return analysis_simulation(self.df)
+
+    @cached_property
+    def simulation_termination(self):
+        """analysis_simulation_termination"""
+        return analysis_simulation_termination(self.df)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012-2022, OpenGeoSys Community (http://www.opengeosys.org)
+#            Distributed under a Modified BSD License.
+#              See accompanying file LICENSE.txt or
+#              http://www.opengeosys.org/project/license
+
+import math
+import time
+from dataclasses import dataclass
+
+from ogs6py.log_parser.log_parser import IncrementalLogParser
+
+
+@dataclass
+class Anomaly:
+    """An event of `LogMonitor`.
+
+    kind: 'threshold' (the recent mean exceeds `ratio` times the baseline) or 'change_point'
+    (the cumulative sum of the standardized deviations from the baseline exceeds the limit).
+    quantity: a column (assembly_time, linear_solver_time, iteration_time) or
+    'iterations' (the number of newton iterations of a time step).
+    value: the recent mean (threshold) or the value completing the change (change_point),
+    baseline: the long term mean before, score: their ratio or the sum.
+    """
+    kind: str
+    quantity: str
+    mpi_process: int
+    time_step: int
+    line: int
+    value: float
+    baseline: float
+    score: float
+
+
+class RollingStatistics:
+    """Exponentially weighted means of a series of values: a recent mean (span `fast`) and a
+    baseline mean and variance (span `slow`), with a one-sided CUSUM of the deviations. Until
+    there are `slow` values, the baseline is the plain mean and variance of all of them."""
+
+    def __init__(self, fast, slow):
+        self.fast = fast
+        self.slow = slow
+        self.count = 0
+        self.recent = 0.0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.cusum = 0.0
+        self.above = False
+
+    def standardized(self, value):
+        std = max(math.sqrt(self.variance), 1e-3 * abs(self.mean), 1e-12)
+        return (value - self.mean) / std
+
+    def add(self, value):
+        self.count += 1
+        self.recent += 2 / (min(self.fast, self.count) + 1) * (value - self.recent) if self.count > 1 else value
+        alpha = max(2 / (self.slow + 1), 1 / self.count)
+        difference = value - self.mean
+        self.mean += alpha * difference
+        self.variance = (1 - alpha) * (self.variance + alpha * difference * difference)
+
+
+class LogMonitor:
+    """Detects slowdowns in a growing log of a running simulation, see `IncrementalLogParser`.
+
+    For each mpi_process rolling statistics (`RollingStatistics`) are kept of the assembly,
+    linear solver and iteration times of every iteration and of the number of iterations of
+    every time step. An `Anomaly` is emitted when the recent mean of a quantity rises above
+    `ratio` times its baseline (once, until it falls below again) and when the CUSUM of the
+    deviations above the baseline by more than `drift` standard deviations exceeds `limit`
+    (the statistics are restarted then, to learn the changed level as baseline). No events
+    are emitted for the first `warmup` values (after a start or restart).
+    """
+
+    quantities = ['assembly_time', 'linear_solver_time', 'iteration_time']
+
+    def __init__(self, file_name=None, ratio=1.5, fast=5, slow=100, warmup=20, drift=0.5, limit=10.0,
+                 callback=None, force_parallel=False):
+        self.parser = IncrementalLogParser(file_name, force_parallel) if file_name is not None else None
+        self.ratio = ratio
+        self.fast = fast
+        self.slow = slow
+        self.warmup = warmup
+        self.drift = drift
+        self.limit = limit
+        self.callback = callback
+        # (mpi_process, quantity) -> RollingStatistics
+        self.statistics = {}
+        # mpi_process -> (time step, iterations so far, line of the last iteration)
+        self.current_step = {}
+
+    def update(self):
+        """The anomalies in the output appended to the log since the last call."""
+        return self.push(self.parser.update())
+
+    def flush(self):
+        """The anomalies in the rest of the log, to be called when the simulation has finished."""
+        anomalies = self.push(self.parser.flush())
+        for mpi_process in list(self.current_step):
+            anomalies += self._end_time_step(mpi_process)
+        return anomalies
+
+    def follow(self, interval=60.0, finished=None):
+        """Yields anomalies while the log grows, checking every `interval` seconds until
+        `finished()` (e.g. the poll of the simulation process) returns True."""
+        while finished is None or not finished():
+            yield from self.update()
+            time.sleep(interval)
+        yield from self.flush()
+
+    def push(self, df):
+        """The anomalies in the rows of a context filled frame (see `fill_ogs_context`) that
+        continues the rows pushed before."""
+        anomalies = []
+        if df.empty:
+            return anomalies
+        columns = [column for column in self.quantities if column in df]
+        iterations = 'iteration_time' in df and 'iteration_number' in df
+        if not columns:
+            return anomalies
+        # only the rows with a value of a quantity, in the order of the log
+        rows = df.loc[df[columns].notna().any(axis=1),
+                      ['mpi_process', 'time_step', 'line', *columns, *(['iteration_number'] if iterations else [])]]
+        for row in rows.itertuples(index=False):
+            mpi_process, time_step = int(row.mpi_process), int(row.time_step)
+            step = self.current_step.get(mpi_process)
+            if step is not None and step[0] != time_step:
+                anomalies += self._end_time_step(mpi_process)
+            for column in columns:
+                value = getattr(row, column)
+                if not math.isnan(value):
+                    anomalies += self._add(column, mpi_process, time_step, row.line, value)
+            if iterations and not math.isnan(row.iteration_time):
+                _, number, _ = self.current_step.get(mpi_process, (time_step, 0, 0))
+                self.current_step[mpi_process] = (time_step, max(number, int(row.iteration_number)), row.line)
+            elif mpi_process not in self.current_step:
+                self.current_step[mpi_process] = (time_step, 0, row.line)
+        return anomalies
+
+    def _end_time_step(self, mpi_process):
+        time_step, number, line = self.current_step.pop(mpi_process)
+        if number == 0:
+            return []
+        return self._add('iterations', mpi_process, time_step, line, float(number))
+
+    def _add(self, quantity, mpi_process, time_step, line, value):
+        statistics = self.statistics.get((mpi_process, quantity))
+        if statistics is None:
+            statistics = self.statistics[(mpi_process, quantity)] = RollingStatistics(self.fast, self.slow)
+        anomalies = []
+        if statistics.count >= self.warmup:
+            statistics.cusum = max(0.0, statistics.cusum + statistics.standardized(value) - self.drift)
+            if statistics.cusum > self.limit:
+                anomalies.append(Anomaly('change_point', quantity, mpi_process, time_step, int(line),
+                                         value, statistics.mean, statistics.cusum))
+                # the baseline is learned anew at the changed level
+                statistics = self.statistics[(mpi_process, quantity)] = RollingStatistics(self.fast, self.slow)
+        statistics.add(value)
+        if statistics.count > self.warmup:
+            score = statistics.recent / statistics.mean if statistics.mean > 0 else 0.0
+            if score > self.ratio and not statistics.above:
+                anomalies.append(Anomaly('threshold', quantity, mpi_process, time_step, int(line),
+                                         statistics.recent, statistics.mean, score))
+            statistics.above = score > self.ratio
+        if self.callback is not None:
+            for anomaly in anomalies:
+                self.callback(anomaly)
+        return anomalies
@@ -5,15 +5,45 @@
 #              See accompanying file LICENSE.txt or
 #              http://www.opengeosys.org/project/license
 
+import bz2
+import functools
+import glob
+import gzip
+import io
+import lzma
+import mmap
+import os
+import pickle
 import re
-from ogs6py.ogs_regexes.ogs_regexes import ogs_regexes
+import warnings
+from array import array
+from contextlib import contextmanager
+from itertools import islice
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+from ogs6py.ogs_regexes.ogs_regexes import ogs_regexes, registry_version
+from ogs6py.log_parser.common_ogs_analyses import ContextFiller, fill_ogs_context, analysis_columns
+from ogs6py.log_parser.parse_cache import ParseCache
+from ogs6py.log_parser.time_step_index import TimeStepIndex
+
+
+@functools.lru_cache(maxsize=None)
+def _record_types(pattern_class):
+    # converters of type, line, mpi_process and the fields of pattern_class, computed once
+    return (str, int, int,) + tuple(pattern_class.__annotations__.values())
 
 
 def try_match_parallel_line(line: str, line_nr: int, regex: re.Pattern, pattern_class):
     if match := regex.match(line):
         # Line , Process, Type specific
         ts=pattern_class.type_str()
-        types = (str,int, int,) + tuple(pattern_class.__annotations__.values())
+        types = _record_types(pattern_class)
         match_with_line = (ts,line_nr,) + match.groups()
         return [ctor(s) for ctor, s in zip(types, match_with_line)]
     return None
@@ -23,54 +53,1028 @@ def try_match_serial_line(line: str, line_nr: int, regex: re.Pattern, pattern_cl
     if match := regex.match(line):
         # Line , Process, Type specific
         ts=pattern_class.type_str()
-        types = (str, int, int,) + tuple(pattern_class.__annotations__.values())
+        types = _record_types(pattern_class)
         match_with_line = (ts,line_nr, 0,) + match.groups()
         return [ctor(s) for ctor, s in zip(types, match_with_line)]
     return None
 
 
+_compression_magic = {b'\x1f\x8b': gzip.open, b'\xfd7zXZ\x00': lzma.open, b'BZh': bz2.open}
+
+
+def compression(file_name):
+    """The stdlib open function decompressing the log (detected by magic bytes), or None."""
+    with open(file_name, 'rb') as file:
+        start = file.read(6)
+    for magic, codec in _compression_magic.items():
+        if start.startswith(magic):
+            return codec
+    return None
+
+
+class _LogReader(io.TextIOWrapper):
+    # Text stream over a (decompressed) log, which also closes the underlying file
+    def __init__(self, stream, file):
+        super().__init__(stream)
+        self.file = file
+
+    def compressed_position(self):
+        return self.file.tell()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+def open_log(file_name, binary=False):
+    """Opens a log file for reading, gzip, xz and bz2 compressed logs are decompressed on the fly.
+
+    Nothing is written to disk, the decompressed data is streamed as the file is read.
+    """
+    codec = compression(file_name)
+    if binary:
+        return open(file_name, 'rb') if codec is None else codec(file_name, 'rb')
+    file = open(file_name, 'rb')
+    return _LogReader(file if codec is None else codec(file, 'rb'), file)
+
+
+_header_regex = "info: This is OpenGeoSys-6 version|info: OGS started on"
+
+
 def mpi_processes(file_name):
     occurrences = 0
-    with open(file_name) as file:
+    with open_log(file_name) as file:
         lines = iter(file)
         # There is no synchronisation barrier between both info, we count both and divide
-        while re.search("info: This is OpenGeoSys-6 version|info: OGS started on", next(lines)):
+        while re.search(_header_regex, next(lines, '')):
             occurrences = occurrences + 1
         processes = int(occurrences / 2)
         return processes
 
 
-def parse_file(file_name, maximum_lines=None, force_parallel=False):
-    ogs_res = ogs_regexes()
+_metacharacters = set('.^$*+?{}[]()|')
+_quantifiers = set('*+?{')
+
+
+def _literal_prefix(regex):
+    # Splits a regex into its leading literal text and the rest
+    literal = []
+    position = 0
+    while position < len(regex):
+        if regex[position] == '\\':
+            if position + 1 == len(regex) or regex[position + 1].isalnum():
+                break
+            step, text = 2, regex[position + 1]
+        elif regex[position] in _metacharacters:
+            break
+        else:
+            step, text = 1, regex[position]
+        if position + step < len(regex) and regex[position + step] in _quantifiers:
+            break
+        literal.append(text)
+        position += step
+    return ''.join(literal), regex[position:]
+
+
+def _factor_alternatives(alternatives):
+    """Joins (literal prefix, rest) alternatives into one regex sharing common literal prefixes.
+
+    Alternatives starting with different characters can never match the same text, so they
+    may be regrouped by their first character. An alternative without literal prefix is a
+    barrier that nothing is moved across, so the first matching alternative stays the same as
+    in the plain alternation.
+    """
+    groups = []
+    barrier = 0
+    for literal, rest in alternatives:
+        key = literal[:1]
+        group = next((g for g in groups[barrier:] if key and g[0] == key), None)
+        if group is None:
+            groups.append([key, [(literal, rest)]])
+            if not key:
+                barrier = len(groups)
+        else:
+            group[1].append((literal, rest))
+    parts = []
+    for key, items in groups:
+        if len(items) == 1:
+            parts.append(re.escape(items[0][0]) + items[0][1])
+        else:
+            common = os.path.commonprefix([literal for literal, _ in items])
+            parts.append(re.escape(common) + _factor_alternatives(
+                [(literal[len(common):], rest) for literal, rest in items]))
+    return parts[0] if len(parts) == 1 else '(?:' + '|'.join(parts) + ')'
+
+
+class PatternMatcher:
+    """Matches a log line against all patterns of `ogs_regexes()` with a single regex call.
+
+    All patterns are joined into one alternation, each wrapped in a named group. The name of
+    the group that matched (`lastgroup`) selects the record type and the slice of
+    `match.groups()` that belongs to it. Common literal prefixes of the patterns (e.g.
+    'info: [time] ') are matched only once. Lines that match no pattern cost one regex call
+    instead of one call per pattern. With `record_types` only lines of these record types are
+    returned (see `select_patterns`).
+    """
+
+    def __init__(self, ogs_res, parallel_log=False, record_types=None):
+        if record_types is not None:
+            ogs_res = select_patterns(ogs_res, record_types)
+        process_regex = '\\[(\\d+)\\]\\ ' if parallel_log else ''
+        alternatives = []
+        number_of_groups = {}
+        for index, (regex, pattern_class) in enumerate(ogs_res):
+            name = 'p{}'.format(index)
+            number_of_groups[name] = re.compile(regex).groups
+            literal, rest = _literal_prefix(regex)
+            alternatives.append((literal, '(?P<{}>{})'.format(name, rest)))
+        self.parallel_log = parallel_log
+        pattern = process_regex + _factor_alternatives(alternatives)
+        self.regex = re.compile(pattern)
+        # Same pattern for lines that are not decoded (see parse_file_mmap)
+        self.bytes_regex = re.compile(pattern.encode())
+        # Same pattern searched in a text block, matching after a line break (see _scan_frame)
+        self.scan_regex = re.compile('\n' + pattern, re.MULTILINE)
+
+        self.dispatch = {}
+        for index, (regex, pattern_class) in enumerate(ogs_res):
+            name = 'p{}'.format(index)
+            # The groups of an alternative follow the named group wrapping it, as index into
+            # match.groups() the first one is the group number of the named group
+            first_group = self.regex.groupindex[name]
+            if pattern_class is None:
+                self.dispatch[name] = None
+                continue
+            types = tuple(pattern_class.__annotations__.values())
+            self.dispatch[name] = (pattern_class, pattern_class.type_str(), types,
+                                   first_group, first_group + number_of_groups[name])
+
+    def match_groups(self, line: str):
+        """Returns (pattern_class, mpi_process, groups of the pattern) or None."""
+        match = self.regex.match(line)
+        if match is None:
+            return None
+        entry = self.dispatch[match.lastgroup]
+        if entry is None:
+            return None
+        pattern_class, _, _, first, last = entry
+        groups = match.groups()
+        mpi_process = int(groups[0]) if self.parallel_log else 0
+        return pattern_class, mpi_process, groups[first:last]
+
+    def match(self, line: str, line_nr: int):
+        match = self.regex.match(line)
+        if match is None:
+            return None
+        entry = self.dispatch[match.lastgroup]
+        if entry is None:
+            return None
+        pattern_class, ts, types, first, last = entry
+        groups = match.groups()
+        mpi_process = int(groups[0]) if self.parallel_log else 0
+        values = [ctor(s) for ctor, s in zip(types, groups[first:last])]
+        return pattern_class(ts, line_nr, mpi_process, *values)
+
+    @property
+    def categories(self):
+        """Sorted type strings of the record types."""
+        return sorted({entry[1] for entry in self.dispatch.values() if entry is not None})
+
+
+def select_patterns(ogs_res, record_types):
+    """The patterns of `record_types`, and the patterns that would match their lines first.
+
+    Patterns are tried in order, so a pattern of another record type preceding a selected
+    pattern with a compatible literal prefix (e.g. the coupled scheme variant of 'Solving
+    process') is kept with None as record type, its lines are skipped. All other patterns are
+    dropped, lines they would match fail the combined regex early.
+    """
+    prefixes = [_literal_prefix(regex)[0] for regex, _ in ogs_res]
+    selection = []
+    later_prefixes = []
+    # backwards, so the prefixes of the selected patterns after each pattern are at hand
+    for (regex, pattern_class), literal in zip(reversed(ogs_res), reversed(prefixes)):
+        if pattern_class in record_types:
+            selection.append((regex, pattern_class))
+            later_prefixes.append(literal)
+        elif any(prefix.startswith(literal) or literal.startswith(prefix) for prefix in later_prefixes):
+            selection.append((regex, None))
+    return selection[::-1]
+
+
+def record_types_for(columns, ogs_res=None):
+    """The record types of `ogs_regexes()` with a field in `columns`."""
+    columns = set(columns)
+    return {pattern_class for _, pattern_class in (ogs_res or ogs_regexes())
+            if columns.intersection(pattern_class.__annotations__)}
+
+
+def analysis_record_types(analysis):
+    """The record types an analysis of `common_ogs_analyses` (after fill_ogs_context) depends on."""
+    # fill_ogs_context needs time_step and iteration_number in any case
+    return record_types_for([*analysis_columns[analysis], 'time_step', 'iteration_number'])
+
+
+_pattern_matchers = {}
+
+
+def pattern_matcher(parallel_log=False, record_types=None):
+    """The PatternMatcher of `ogs_regexes()`, compiled once per process.
+
+    Serial and parallel variant (and each selection of record types) are cached separately and
+    compiled again only after record types have been registered (see `ogs_regexes.register`).
+    """
+    record_types = frozenset(record_types) if record_types is not None else None
+    key = (parallel_log, record_types, registry_version())
+    matcher = _pattern_matchers.get(key)
+    if matcher is None:
+        if len(_pattern_matchers) > 32:
+            _pattern_matchers.clear()
+        matcher = _pattern_matchers[key] = PatternMatcher(ogs_regexes(), parallel_log, record_types)
+    return matcher
+
+
+# Column buffers and final dtypes per annotated field type
+_typecodes = {int: 'q', float: 'd'}
+_dtypes = {int: 'Int64', float: 'float64', str: 'object'}
+
+
+def _decode(value: bytes):
+    return value.decode()
+
+
+def bytes_converters(types):
+    # int() and float() accept bytes directly, only text fields need decoding
+    return tuple(_decode if t is str else t for t in types)
+
+
+def column_dtypes(pattern_classes):
+    """Dtype plan derived from the dataclass annotations of the record types.
+
+    Integer fields become nullable 'Int64', float fields 'float64', text 'object' and the
+    record `type` a 'category'.
+    """
+    plan = {}
+    for pattern_class in pattern_classes:
+        for field in fields(pattern_class):
+            plan.setdefault(field.name, _dtypes[field.type])
+    plan['type'] = 'category'
+    return plan
+
+
+class _TypeColumns:
+    # Dense buffers for all records of one record type, rows gives their row in the frame
+    def __init__(self, pattern_class, from_bytes=False):
+        self.type_str = pattern_class.type_str()
+        self.rows = array('q')
+        self.line = array('q')
+        self.mpi_process = array('q')
+        self.names = list(pattern_class.__annotations__)
+        self.buffers = [array(_typecodes[t]) if t in _typecodes else list()
+                        for t in pattern_class.__annotations__.values()]
+        types = tuple(pattern_class.__annotations__.values())
+        self.appenders = list(zip([buffer.append for buffer in self.buffers],
+                                  bytes_converters(types) if from_bytes else types))
+
+
+class ColumnarRecordBuilder:
+    """Collects matched log lines into typed per-column buffers and builds one DataFrame.
+
+    Compared to a list of dataclass instances no object is created per record, the values are
+    converted once while appending and the final frame already carries the dtypes that
+    `fill_ogs_context` would otherwise convert to.
+    """
+
+    def __init__(self, categories=None, from_bytes=False):
+        # Fixed categories for `type` keep chunks of one log concatenable as categorical
+        self.categories = categories
+        # groups are bytes (see parse_file_mmap) instead of str
+        self.from_bytes = from_bytes
+        self.number_of_rows = 0
+        self.columns = {}
+        self.column_order = ['type', 'line', 'mpi_process']
+
+    def append(self, pattern_class, line_nr: int, mpi_process: int, groups):
+        columns = self.columns.get(pattern_class)
+        if columns is None:
+            columns = self.columns[pattern_class] = _TypeColumns(pattern_class, self.from_bytes)
+            self.column_order += [name for name in columns.names if name not in self.column_order]
+        columns.rows.append(self.number_of_rows)
+        columns.line.append(line_nr)
+        columns.mpi_process.append(mpi_process)
+        for (append, ctor), s in zip(columns.appenders, groups):
+            append(ctor(s))
+        self.number_of_rows += 1
+
+    def to_dataframe(self):
+        n = self.number_of_rows
+        if n == 0:
+            return pd.DataFrame()
+        plan = column_dtypes(self.columns)
+        values = {}
+        masks = {}
+        for name in self.column_order[1:]:
+            if plan[name] == 'Int64':
+                values[name] = np.zeros(n, dtype=np.int64)
+                masks[name] = np.ones(n, dtype=bool)
+            elif plan[name] == 'float64':
+                values[name] = np.full(n, np.nan)
+            else:
+                values[name] = np.full(n, np.nan, dtype=object)
+        categories = self.categories or sorted({columns.type_str for columns in self.columns.values()})
+        codes = np.zeros(n, dtype=np.int8)
+
+        for columns in self.columns.values():
+            rows = np.frombuffer(columns.rows, dtype=np.int64)
+            codes[rows] = categories.index(columns.type_str)
+            for name, buffer in [('line', columns.line), ('mpi_process', columns.mpi_process),
+                                 *zip(columns.names, columns.buffers)]:
+                if isinstance(buffer, list):
+                    values[name][rows] = buffer
+                else:
+                    values[name][rows] = np.frombuffer(buffer, dtype=buffer.typecode)
+                if name in masks:
+                    masks[name][rows] = False
+
+        data = {'type': pd.Categorical.from_codes(codes, categories)}
+        for name in self.column_order[1:]:
+            if name in masks:
+                data[name] = pd.arrays.IntegerArray(values[name], masks[name])
+            else:
+                data[name] = values[name]
+        return pd.DataFrame(data, columns=self.column_order)
+
+
+def _read_records(file, matcher, maximum_lines=None):
+    match = matcher.match
+    number_of_lines_read = 0
+    records = list()
+    for line in islice(file, maximum_lines):
+        number_of_lines_read += 1
+
+        if r := match(line, number_of_lines_read):
+            records.append(r)
+    return records, number_of_lines_read
+
+
+def _read_frame(file, matcher, maximum_lines=None, categories=None):
+    match_groups = matcher.match_groups
+    builder = ColumnarRecordBuilder(categories)
+    append = builder.append
+    number_of_lines_read = 0
+    for line in islice(file, maximum_lines):
+        number_of_lines_read += 1
+
+        if r := match_groups(line):
+            append(r[0], number_of_lines_read, r[1], r[2])
+    return builder.to_dataframe(), number_of_lines_read
+
+
+def _scan_frame(file, matcher, categories=None, block_size=1 << 24):
+    # Like _read_frame, but searches blocks of lines for matches instead of matching each
+    # line, so lines not matching are skipped without a Python call. Pays off for a selection
+    # of record types (see select_patterns) where most lines do not match.
+    scan = matcher.scan_regex.finditer
+    dispatch = matcher.dispatch
+    parallel_log = matcher.parallel_log
+    builder = ColumnarRecordBuilder(categories)
+    append = builder.append
+    number_of_lines_read = 0
+    while block := file.read(block_size):
+        block += file.readline()
+        # each line of the block is preceded by a line break
+        text = '\n' + block
+        count = text.count
+        line_start = 0
+        line_nr = number_of_lines_read
+        for match in scan(text):
+            line_nr += count('\n', line_start, match.start() + 1)
+            line_start = match.start() + 1
+            entry = dispatch[match.lastgroup]
+            if entry is not None:
+                pattern_class, _, _, first, last = entry
+                groups = match.groups()
+                append(pattern_class, line_nr, int(groups[0]) if parallel_log else 0, groups[first:last])
+        number_of_lines_read += block.count('\n') + (not block.endswith('\n'))
+    return builder.to_dataframe(), number_of_lines_read
+
+
+def parse_file(file_name, maximum_lines=None, force_parallel=False, workers=None, record_types=None):
+    """Parses a log file into a list of records (see `ogs_regexes`).
+
+    With workers > 1 the file is split into byte ranges at line boundaries which are parsed
+    in a process pool, see `parse_file_in_pool`. Compressed logs (see `open_log`) are
+    decompressed while reading and always parsed serially. With `record_types` (e.g. from
+    `record_types_for` or `analysis_record_types`) only records of these types are returned,
+    the patterns of the others are not tried.
+    """
+    parallel_log = force_parallel or mpi_processes(file_name) > 1
+    if workers is not None and workers > 1 and maximum_lines is None and compression(file_name) is None:
+        return parse_file_in_pool(file_name, workers, parallel_log, as_dataframe=False, record_types=record_types)
+    with open_log(file_name) as file:
+        records, _ = _read_records(file, pattern_matcher(parallel_log, record_types), maximum_lines)
+    return records
+
+
+def parse_file_to_dataframe(file_name, maximum_lines=None, force_parallel=False, workers=None,
+                            cache=None, record_types=None):
+    """Parses a log file directly into a typed DataFrame (see `ColumnarRecordBuilder`).
+
+    Same rows and columns as `pd.DataFrame(parse_file(...))`, but integer columns are
+    'Int64' and `type` is categorical already. With `cache` (directory or `ParseCache`)
+    the frame is reused until the log changes.
+    """
+    if cache is not None:
+        key = 'parse_file-{}-{}'.format(maximum_lines, force_parallel)
+        if record_types is not None:
+            key += '-' + '_'.join(sorted(pattern_class.__name__ for pattern_class in record_types))
+        return ParseCache.of(cache).cached(file_name, key, lambda: parse_file_to_dataframe(
+            file_name, maximum_lines, force_parallel, workers, record_types=record_types))
     parallel_log = force_parallel or mpi_processes(file_name) > 1
+    if workers is not None and workers > 1 and maximum_lines is None and compression(file_name) is None:
+        return parse_file_in_pool(file_name, workers, parallel_log, as_dataframe=True, record_types=record_types)
+    with open_log(file_name) as file:
+        if record_types is not None and maximum_lines is None:
+            df, _ = _scan_frame(file, pattern_matcher(parallel_log, record_types))
+        else:
+            df, _ = _read_frame(file, pattern_matcher(parallel_log, record_types), maximum_lines)
+    return df
+
+
+class _FileRange(io.RawIOBase):
+    # Raw binary reader restricted to the bytes [start, end) of a file
+    def __init__(self, file_name, start, end):
+        super().__init__()
+        self.file = open(file_name, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.file.readinto(memoryview(buffer)[:min(len(buffer), self.remaining)])
+        self.remaining -= n
+        return n
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def line_aligned_byte_ranges(file_name, parts):
+    """Splits a file into at most `parts` byte ranges that start at the beginning of a line."""
+    size = os.path.getsize(file_name)
+    bounds = [0]
+    with open(file_name, 'rb') as file:
+        for part in range(1, parts):
+            file.seek(max(size * part // parts - 1, bounds[-1]))
+            file.readline()
+            if file.tell() > bounds[-1]:
+                bounds.append(min(file.tell(), size))
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
 
-    if parallel_log:
-        process_regex = '\\[(\\d+)\\]\\ '
-        try_match = try_match_parallel_line
+
+def _parse_byte_range(file_name, start, end, parallel_log, as_dataframe, record_types=None):
+    matcher = pattern_matcher(parallel_log, record_types)
+    with io.TextIOWrapper(io.BufferedReader(_FileRange(file_name, start, end))) as file:
+        if as_dataframe:
+            if record_types is not None:
+                return _scan_frame(file, matcher, categories=matcher.categories)
+            return _read_frame(file, matcher, categories=matcher.categories)
+        return _read_records(file, matcher)
+
+
+def parse_file_in_pool(file_name, workers, parallel_log=False, as_dataframe=False, record_types=None):
+    """Parses a log file with a pool of `workers` processes, one line aligned byte range each.
+
+    The line numbers of each range are shifted by the number of lines of the preceding ranges,
+    so the result is identical to a serial parse.
+    """
+    ranges = line_aligned_byte_ranges(file_name, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_parse_byte_range, *zip(*[(file_name, start, end, parallel_log, as_dataframe,
+                                                           record_types) for start, end in ranges])))
+    line_offset = 0
+    parts = []
+    for part, number_of_lines_read in results:
+        if as_dataframe:
+            if not part.empty:
+                part['line'] += line_offset
+                parts.append(part)
+        else:
+            for record in part:
+                record.line += line_offset
+            parts.extend(part)
+        line_offset += number_of_lines_read
+    if not as_dataframe:
+        return parts
+    if not parts:
+        return pd.DataFrame()
+    df = pd.concat(parts, ignore_index=True)
+    df['type'] = df['type'].cat.remove_unused_categories()
+    return df
+
+
+@contextmanager
+def _log_bytes(log):
+    # the bytes of a log: memory mapped, decompressed for compressed logs, or given as bytes
+    if isinstance(log, (bytes, bytearray)):
+        yield log
+    elif compression(log) is not None:
+        with open_log(log, binary=True) as file:
+            yield file.read()
+    elif os.path.getsize(log) == 0:
+        yield b''
     else:
-        process_regex = ''
-        try_match = try_match_serial_line
+        with open(log, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def demultiplex_ranks(data, block_size=1 << 24):
+    """Finds the lines of each mpi_process in the bytes of a parallel log, in one pass.
+
+    Returns {mpi_process: (line numbers, start offsets, end offsets)}, ordered by mpi_process.
+    The offsets delimit the lines without the rank prefix and the line ending, so each rank's
+    lines can be matched in place later (see `RankFrames`). Lines without a rank prefix (the
+    header) are dropped, as in `parse_file`. Line breaks and prefixes are found with numpy,
+    in blocks of `block_size` bytes.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    size = len(buffer)
+    if size == 0:
+        return {}
+    ends = [np.flatnonzero(buffer[offset:offset + block_size] == ord('\n')) + offset
+            for offset in range(0, size, block_size)]
+    if buffer[-1] != ord('\n'):
+        ends.append(np.array([size]))
+    ends = np.concatenate(ends)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+
+    # rank prefix '[<digits>] '
+    lines = np.flatnonzero(buffer[np.minimum(starts, size - 1)] == ord('['))
+    position = starts[lines] + 1
+    ranks = np.zeros(len(lines), dtype=np.int64)
+    digits = np.zeros(len(lines), dtype=np.int64)
+    reading = np.ones(len(lines), dtype=bool)
+    while reading.any():
+        byte = buffer[np.minimum(position + digits, size - 1)]
+        reading &= (position + digits < size) & (byte >= ord('0')) & (byte <= ord('9'))
+        ranks[reading] = ranks[reading] * 10 + byte[reading] - ord('0')
+        digits += reading
+    after = position + digits
+    valid = ((digits > 0) & (after + 1 < size) & (buffer[np.minimum(after, size - 1)] == ord(']')) &
+             (buffer[np.minimum(after + 1, size - 1)] == ord(' ')))
+    lines, ranks, line_starts = lines[valid], ranks[valid], after[valid] + 2
+    line_ends = ends[lines]
+    # CRLF line endings, as the universal newlines of the text mode parsers
+    line_ends -= (line_ends > line_starts) & (buffer[line_ends - 1] == ord('\r'))
+
+    order = np.argsort(ranks, kind='stable')
+    unique_ranks, first = np.unique(ranks[order], return_index=True)
+    return {int(rank): (lines[indices] + 1, line_starts[indices], line_ends[indices])
+            for rank, indices in zip(unique_ranks, np.split(order, first[1:]))}
+
+
+def _parse_ranks(log, streams, categories, fill_context):
+    # streams: [(mpi_process, line numbers, start offsets, end offsets)] of the log (file name
+    # or bytes, see _log_bytes), each line is matched in place with the serial patterns
+    matcher = pattern_matcher()
+    match = matcher.bytes_regex.match
+    dispatch = {name: entry and (entry[0], entry[3], entry[4]) for name, entry in matcher.dispatch.items()}
+    builder = ColumnarRecordBuilder(categories, from_bytes=True)
+    append = builder.append
+    with _log_bytes(log) as data:
+        for mpi_process, line_numbers, starts, ends in streams:
+            for line_nr, start, end in zip(line_numbers.tolist(), starts.tolist(), ends.tolist()):
+                if (m := match(data, start, end)) and (entry := dispatch[m.lastgroup]):
+                    pattern_class, first, last = entry
+                    append(pattern_class, line_nr, mpi_process, m.groups()[first:last])
+    df = builder.to_dataframe()
+    # (first line, position) of each column, to restore the column order of the whole log
+    first_lines = {}
+    for columns in builder.columns.values():
+        for name in ['line', 'mpi_process'] + columns.names:
+            first = (np.frombuffer(columns.line, dtype=np.int64).min(), builder.column_order.index(name))
+            first_lines[name] = min(first, first_lines.get(name, first))
+    if fill_context and not df.empty:
+        for column in ['time_step', 'iteration_number']:
+            if column not in df:
+                df[column] = pd.array([pd.NA] * len(df), dtype='Int64')
+        df = fill_ogs_context(df)
+    return df, first_lines
+
+
+class RankFrames(Mapping):
+    """The records of a parallel log per mpi_process, parsed lazily.
+
+    The lines of each rank are located in one pass over the memory mapped log, only their
+    offsets are kept (see `demultiplex_ranks`). A rank's frame is parsed (and context filled,
+    see `fill_ogs_context`) on first access, so a single rank can be analysed without parsing
+    the others. `to_dataframe` parses the remaining ranks, in batches of ranks in a process
+    pool if workers > 1 (each worker maps the log itself), and returns the frame of the whole
+    log, equal to `fill_ogs_context(parse_file_to_dataframe(file_name))`. Compressed logs are
+    decompressed into memory once and parsed without a pool.
+    """
+
+    def __init__(self, file_name, fill_context=True):
+        # the decompressed bytes of compressed logs, plain logs are mapped again when parsed
+        self.log = file_name
+        if compression(file_name) is not None:
+            with _log_bytes(file_name) as data:
+                self.log = data
+        with _log_bytes(self.log) as data:
+            self.streams = demultiplex_ranks(data)
+        self.fill_context = fill_context
+        pattern_classes = [pattern_class for _, pattern_class in ogs_regexes()]
+        self.dtypes = column_dtypes(pattern_classes)
+        self.categories = sorted({pattern_class.type_str() for pattern_class in pattern_classes})
+        self.frames = {}
+        self.first_lines = {}
+
+    def __getitem__(self, mpi_process):
+        if mpi_process not in self.frames:
+            self.frames[mpi_process], self.first_lines[mpi_process] = _parse_ranks(
+                self.log, [(mpi_process, *self.streams[mpi_process])], self.categories, self.fill_context)
+        return self.frames[mpi_process]
+
+    def __iter__(self):
+        return iter(self.streams)
+
+    def __len__(self):
+        return len(self.streams)
+
+    def to_dataframe(self, workers=None):
+        missing = [(rank, *self.streams[rank]) for rank in self.streams if rank not in self.frames]
+        results = [(self.frames[rank], self.first_lines[rank]) for rank in self.frames]
+        if workers is not None and workers > 1 and len(missing) > 1 and isinstance(self.log, str):
+            batches = [missing[i::4 * workers] for i in range(min(len(missing), 4 * workers))]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results += pool.map(_parse_ranks, [self.log] * len(batches), batches,
+                                    [self.categories] * len(batches), [self.fill_context] * len(batches))
+        elif missing:
+            results.append(_parse_ranks(self.log, missing, self.categories, self.fill_context))
+        frames = [df for df, _ in results if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+
+        # columns in order of their first appearance in the log, as in ColumnarRecordBuilder
+        first_lines = {}
+        for _, batch_first_lines in results:
+            for name, first in batch_first_lines.items():
+                first_lines[name] = min(first, first_lines.get(name, first))
+        column_order = ['type', *sorted(first_lines, key=first_lines.get)]
+        for df in frames:
+            column_order += [name for name in df.columns if name not in column_order]
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        del results, frames
+        if list(df.columns) != column_order:
+            df = df[column_order]
+        # columns missing in some of the frames may have lost their dtype
+        dtypes = {name: dtype for name, dtype in self.dtypes.items() if name in df and df[name].dtype != dtype}
+        if dtypes:
+            df = df.astype(dtypes)
+        df = df.sort_values('line', kind='stable', ignore_index=True)
+        if self.fill_context and 'component' in df:
+            df['component'] = df['component'].fillna(-1)
+        df['type'] = df['type'].cat.remove_unused_categories()
+        return df
+
+
+def parse_file_by_rank(file_name, workers=None, fill_context=True):
+    """Parses a parallel log per mpi_process, each rank in a worker process (see `RankFrames`).
+
+    Logs of a single mpi_process have no rank prefixes and are parsed as a whole.
+    """
+    if mpi_processes(file_name) <= 1:
+        df = parse_file_to_dataframe(file_name, workers=workers)
+        return fill_ogs_context(df) if fill_context and not df.empty else df
+    return RankFrames(file_name, fill_context).to_dataframe(workers)
+
+
+def _runs(values, maximum_gap=1):
+    # (first, last) of each run of sorted integers with differences of at most maximum_gap
+    values = np.asarray(values)
+    breaks = np.flatnonzero(np.diff(values) > maximum_gap)
+    return list(zip(values[np.concatenate([[0], breaks + 1])].tolist(), values[np.append(breaks, -1)].tolist()))
+
+
+def parse_time_steps(file_name, time_steps, record_types=None, index=None, save_index=True):
+    """Parses only the lines of some time steps of a log, e.g. time_steps=range(10000, 10101).
+
+    The byte ranges of these time steps are looked up in the `TimeStepIndex` of the log (built
+    by scanning the log, stored next to the log unless `save_index` is False, reused by later
+    calls and extended when the log has grown) and only
+    these ranges are parsed, one per run of (nearly) consecutive time steps (see `TimeStepIndex.sample`
+    for strided and time window selections). Returns the rows of `time_steps` after
+    fill_ogs_context, with the line numbers of the whole log. Compressed logs can not be
+    seeked and are parsed entirely.
+    """
+    time_steps = sorted(set(time_steps))
+    if not time_steps:
+        return pd.DataFrame()
+    if compression(file_name) is not None:
+        df = fill_ogs_context(parse_file_to_dataframe(file_name, record_types=record_types))
+        return df[df['time_step'].isin(time_steps)].reset_index(drop=True)
 
-    def compile_re_fn(mpi_process_regex):
-        return lambda regex: re.compile(mpi_process_regex + regex)
+    index = index or TimeStepIndex.load(file_name, save=save_index)
+    parallel_log = mpi_processes(file_name) > 1
+    # a time step after a run is read anyway, time steps one apart are parsed in one run
+    runs = _runs(time_steps, maximum_gap=2)
+    frames = []
+    for run, (first, last) in enumerate(runs):
+        # iteration_number and process are back filled across the end of a time step, from
+        # the first iteration of the following one
+        start, end, start_line = index.byte_range(first, last + 1)
+        df, _ = _parse_byte_range(file_name, start, end, parallel_log, as_dataframe=True, record_types=record_types)
+        if not df.empty:
+            df['line'] += start_line - 1
+            df['run'] = run
+            frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    df['type'] = df['type'].cat.remove_unused_categories()
+    # The ranges of the runs may overlap and the context must not be carried from one to the
+    # next, so each run is filled as separate mpi_processes
+    mpi_process = df['mpi_process']
+    df['mpi_process'] = df['run'] * (int(mpi_process.max()) + 1) + mpi_process
+    df = fill_ogs_context(df)
+    df['mpi_process'] = mpi_process
+    first, last = (np.array(bounds) for bounds in zip(*runs))
+    in_run = ((df['time_step'] >= first[df['run']]) & (df['time_step'] <= last[df['run']]) &
+              df['time_step'].isin(time_steps)).to_numpy(dtype=bool)
+    # rows of overlapping runs interleave in parallel logs
+    df = df[in_run].drop(columns='run')
+    if len(runs) > 1 and parallel_log:
+        df = df.sort_values('line', kind='stable')
+    return df.reset_index(drop=True)
 
-    compile_re = compile_re_fn(process_regex)
-    patterns = [(compile_re(k), v) for k, v in ogs_res]
 
+def _parse_run(file_name, record_types, fill_context):
+    df = parse_file_to_dataframe(file_name, record_types=record_types)
+    return fill_ogs_context(df) if fill_context and not df.empty else df
+
+
+def parse_logs(logs, metadata=None, workers=None, record_types=None, fill_context=True, errors='warn'):
+    """Parses many logs (e.g. of a parameter study) in a pool of at most `workers` processes.
+
+    `logs` is a glob pattern, a list of log files (the file names are the run ids) or a dict
+    {run_id: log file}. Returns one frame of all runs with `run_id` as first index level, to be
+    analysed per run with `common_ogs_analyses.analyse_runs`. `metadata` ({run_id: {name: value}}
+    or a DataFrame indexed by run_id) is added as columns. A log that can not be parsed does
+    not stop the others, also if its worker process died: a warning is issued for it and its
+    error is listed in `df.attrs['errors']` ({run_id: error}). With `errors='raise'` the first
+    error is raised instead, after all logs were tried.
+    """
+    if isinstance(logs, str):
+        logs = sorted(glob.glob(logs))
+    if not isinstance(logs, Mapping):
+        logs = {file_name: file_name for file_name in logs}
+    run_ids = list(logs)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(run_ids)))
+    frames, failures = {}, {}
+    pending = run_ids
+    while pending:
+        # a worker process that dies breaks the pool, the logs not parsed yet are tried again
+        broken = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = {pool.submit(_parse_run, logs[run_id], record_types, fill_context): run_id
+                       for run_id in pending}
+            for future in as_completed(futures):
+                try:
+                    frames[futures[future]] = future.result()
+                except BrokenProcessPool:
+                    broken.append(futures[future])
+                except Exception as e:
+                    failures[futures[future]] = e
+        if len(broken) == len(pending):
+            # no progress, each remaining log gets a pool of its own
+            for run_id in broken:
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    try:
+                        frames[run_id] = pool.submit(_parse_run, logs[run_id], record_types, fill_context).result()
+                    except Exception as e:
+                        failures[run_id] = e
+            broken = []
+        pending = broken
+    failures = {run_id: failures[run_id] for run_id in run_ids if run_id in failures}
+    if failures and errors == 'raise':
+        run_id, error = next(iter(failures.items()))
+        raise Exception('Could not parse {}'.format(logs[run_id])) from error
+    for run_id, error in failures.items():
+        warnings.warn('Could not parse {}: {!r}'.format(logs[run_id], error), RuntimeWarning)
+
+    frames = {run_id: frames[run_id] for run_id in run_ids if run_id in frames}
+    df = pd.concat(frames, names=['run_id', None]) if frames else pd.DataFrame()
+    if 'type' in df:
+        df['type'] = df['type'].astype('category')
+    if metadata is not None and not df.empty:
+        metadata = metadata if isinstance(metadata, pd.DataFrame) else pd.DataFrame.from_dict(metadata,
+                                                                                           orient='index')
+        runs = df.index.get_level_values('run_id')
+        for column in metadata.columns:
+            df[column] = metadata[column].reindex(runs).to_numpy()
+    df.attrs['errors'] = {run_id: repr(error) for run_id, error in failures.items()}
+    return df
+
+
+def parse_file_mmap(file_name, force_parallel=False, as_dataframe=True):
+    """Parses a log file from a memory map of it with bytes patterns.
+
+    Lines are read from the mapped file without decoding them, only the captured groups of
+    matching lines are converted (int and float accept bytes, text fields are decoded). The
+    result is identical to `parse_file_to_dataframe` (or `parse_file` with as_dataframe=False),
+    also for logs with CRLF line endings.
+    Compressed logs cannot be mapped, their decompressed lines are matched the same way.
+    """
+    parallel_log = force_parallel or mpi_processes(file_name) > 1
+    matcher = pattern_matcher(parallel_log)
+    match = matcher.bytes_regex.match
+    dispatch = {name: (pattern_class, ts, bytes_converters(types), first, last)
+                for name, (pattern_class, ts, types, first, last) in matcher.dispatch.items()}
+    builder = ColumnarRecordBuilder(from_bytes=True)
+    append = builder.append
+    records = []
+
+    if os.path.getsize(file_name) == 0:
+        return builder.to_dataframe() if as_dataframe else records
+    if compression(file_name) is None:
+        file = open(file_name, 'rb')
+        lines = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        file = lines = open_log(file_name, binary=True)
+    with file, lines:
+        crlf = lines.readline().endswith(b'\r\n')
+        lines.seek(0)
+        line_iter = iter(lines.readline, b'')
+        if crlf:
+            # the text mode parsers read universal newlines, the patterns are anchored at '$'
+            line_iter = (line.rstrip(b'\r\n') for line in line_iter)
+        for line_nr, line in enumerate(line_iter, start=1):
+            if m := match(line):
+                pattern_class, ts, types, first, last = dispatch[m.lastgroup]
+                groups = m.groups()
+                mpi_process = int(groups[0]) if parallel_log else 0
+                if as_dataframe:
+                    append(pattern_class, line_nr, mpi_process, groups[first:last])
+                else:
+                    records.append(pattern_class(ts, line_nr, mpi_process,
+                                                 *[ctor(s) for ctor, s in zip(types, groups[first:last])]))
+    return builder.to_dataframe() if as_dataframe else records
+
+
+@dataclass
+class ParseProgress:
+    """How far `iter_records` has got, updated in place whenever a record or chunk is yielded."""
+    total_bytes: int = 0
+    bytes_read: int = 0
+    lines_read: int = 0
+    records: int = 0
+
+    @property
+    def fraction(self):
+        return self.bytes_read / self.total_bytes if self.total_bytes else 1.0
+
+
+def iter_records(file_name, chunk_size=None, maximum_lines=None, force_parallel=False, progress=None,
+                 record_types=None):
+    """Yields the records of a log file while it is read.
+
+    With `chunk_size=None` the records are yielded one by one (as returned by `parse_file`),
+    otherwise as typed DataFrames (as returned by `parse_file_to_dataframe`) of at most
+    `chunk_size` rows. Only the current chunk is held in memory. The frames can be context
+    filled with `common_ogs_analyses.iter_fill_ogs_context`. `record_types` selects the
+    records as in `parse_file`.
+    """
+    parallel_log = force_parallel or mpi_processes(file_name) > 1
+    matcher = pattern_matcher(parallel_log, record_types)
+    if progress is None:
+        progress = ParseProgress()
+    progress.total_bytes = os.path.getsize(file_name)
+
+    with open_log(file_name) as file:
+        if chunk_size is None:
+            yield from _iter_single_records(file, matcher, maximum_lines, progress)
+        else:
+            yield from _iter_record_frames(file, matcher, chunk_size, maximum_lines, progress)
+
+
+def _update_progress(progress, file, number_of_lines_read, records):
+    progress.bytes_read = file.compressed_position()
+    progress.lines_read = number_of_lines_read
+    progress.records += records
+
+
+def _iter_single_records(file, matcher, maximum_lines, progress):
+    match = matcher.match
     number_of_lines_read = 0
-    with open(file_name) as file:
-        lines = iter(file)
-        records = list()
-        for line in lines:
-            number_of_lines_read += 1
+    for line in islice(file, maximum_lines):
+        number_of_lines_read += 1
+
+        if r := match(line, number_of_lines_read):
+            _update_progress(progress, file, number_of_lines_read, 1)
+            yield r
+    _update_progress(progress, file, number_of_lines_read, 0)
+
+
+def _iter_record_frames(file, matcher, chunk_size, maximum_lines, progress):
+    match_groups = matcher.match_groups
+    categories = matcher.categories
+    builder = ColumnarRecordBuilder(categories)
+    number_of_lines_read = 0
+    for line in islice(file, maximum_lines):
+        number_of_lines_read += 1
+
+        if r := match_groups(line):
+            builder.append(r[0], number_of_lines_read, r[1], r[2])
+            if builder.number_of_rows == chunk_size:
+                _update_progress(progress, file, number_of_lines_read, chunk_size)
+                yield builder.to_dataframe()
+                builder = ColumnarRecordBuilder(categories)
+    _update_progress(progress, file, number_of_lines_read, builder.number_of_rows)
+    if builder.number_of_rows:
+        yield builder.to_dataframe()
 
-            if (maximum_lines is not None) and (maximum_lines > number_of_lines_read):
-                break
 
-            for key, value in patterns:
-                if r := try_match(line, number_of_lines_read, key, value):
-                    records.append(value(*r))
+class IncrementalLogParser:
+    """Parses a growing log file (e.g. of a running simulation) piece by piece.
+
+    Each call of `update` reads only the bytes appended since the previous call and returns the
+    newly complete, context filled rows (see `common_ogs_analyses.ContextFiller`). The byte
+    offset, line counter, incomplete last line and the context of each mpi_process are kept
+    in the object, which can be stored with `save` and restored with `load` to resume later.
+    If the file got shorter than the offset (log overwritten by a new run), parsing restarts.
+    """
+
+    def __init__(self, file_name, force_parallel=False, align_time_steps=False):
+        self.file_name = file_name
+        self.force_parallel = force_parallel
+        self.align_time_steps = align_time_steps
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.lines_read = 0
+        self.partial_line = b''
+        self.header_lines = 0
+        self.matcher = pattern_matcher(True) if self.force_parallel else None
+        self.undecided_lines = []
+        self.context = ContextFiller(self.align_time_steps)
+
+    def update(self):
+        """Returns a DataFrame with the rows completed by the output appended since the last call."""
+        if os.path.getsize(self.file_name) < self.offset:
+            self.reset()
+        with open(self.file_name, 'rb') as file:
+            file.seek(self.offset)
+            data = file.read()
+        self.offset += len(data)
+        lines = (self.partial_line + data).split(b'\n')
+        self.partial_line = lines.pop()
+        return self.context.push(self._parse(lines))
+
+    def flush(self):
+        """Returns all rows still held back, to be called when the log is complete."""
+        lines = [self.partial_line] if self.partial_line else []
+        self.partial_line = b''
+        if self.matcher is None:
+            # log consists of the header only, see mpi_processes
+            self.matcher = pattern_matcher(self.header_lines // 2 > 1)
+        self.context.push(self._parse(lines))
+        return self.context.flush()
+
+    def _parse(self, lines):
+        # as the universal newlines of the text mode parsers, for logs with CRLF line endings
+        lines = [line.rstrip(b'\r').decode() for line in lines]
+        if self.matcher is None:
+            # Serial or parallel log is known after the header lines (see mpi_processes)
+            self.undecided_lines += lines
+            for line in self.undecided_lines[self.header_lines:]:
+                if not re.search(_header_regex, line):
+                    self.matcher = pattern_matcher(self.header_lines // 2 > 1)
                     break
+                self.header_lines += 1
+            if self.matcher is None:
+                return pd.DataFrame()
+            lines, self.undecided_lines = self.undecided_lines, []
 
-    return records
+        match_groups = self.matcher.match_groups
+        categories = self.matcher.categories
+        builder = ColumnarRecordBuilder(categories)
+        for line in lines:
+            self.lines_read += 1
+            if r := match_groups(line):
+                builder.append(r[0], self.lines_read, r[1], r[2])
+        return builder.to_dataframe()
+
+    def save(self, file_name):
+        with open(file_name, 'wb') as file:
+            pickle.dump(self, file)
 
+    @staticmethod
+    def load(file_name):
+        with open(file_name, 'rb') as file:
+            return pickle.load(file)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012-2022, OpenGeoSys Community (http://www.opengeosys.org)
+#            Distributed under a Modified BSD License.
+#              See accompanying file LICENSE.txt or
+#              http://www.opengeosys.org/project/license
+
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from ogs6py.ogs_regexes.ogs_regexes import registry_digest
+
+try:
+    import pyarrow
+
+    parquet = True
+except ImportError:
+    parquet = False
+
+
+def content_hash(file_name, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_name, 'rb') as file:
+        while block := file.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """On-disk cache of parsed log frames and analysis results.
+
+    Entries are keyed by the absolute path, size, modification time and content hash of the
+    log together with a name of what was computed (e.g. the filter of `OGS.parse_out`) and the
+    registered record types (see `ogs_regexes.register`). The content hash is only recomputed
+    when size or modification time changed. When a log changes, all entries of its previous
+    version are removed. Frames are stored as parquet if pyarrow is installed and the frame
+    allows it, otherwise pickled. Parquet turns nullable index levels (e.g. the 'Int64'
+    mpi_process and time_step of the analyses) into plain ones, so named index levels are
+    stored as columns and set as index again on reading. If the entries exceed `max_bytes`,
+    the least recently used are evicted.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.index_file = os.path.join(directory, 'index.json')
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as file:
+                self.index = json.load(file)
+        else:
+            self.index = {'logs': {}, 'entries': {}}
+
+    @staticmethod
+    def of(cache):
+        """A ParseCache for a cache directory, or the given ParseCache itself."""
+        return cache if isinstance(cache, ParseCache) else ParseCache(cache)
+
+    def fingerprint(self, file_name):
+        path = os.path.abspath(file_name)
+        stat = os.stat(path)
+        log = self.index['logs'].get(path)
+        if log is None or log['size'] != stat.st_size or log['mtime_ns'] != stat.st_mtime_ns:
+            content = content_hash(path)
+            key = '{}|{}|{}|{}'.format(path, stat.st_size, stat.st_mtime_ns, content)
+            fingerprint = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+            if log is not None:
+                # the log has changed, entries of the previous version are stale
+                self._remove(name for name in list(self.index['entries'])
+                             if name.startswith(log['fingerprint']))
+            self.index['logs'][path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                        'hash': content, 'fingerprint': fingerprint}
+            self._write_index()
+        return self.index['logs'][path]['fingerprint']
+
+    def _entry(self, file_name, key):
+        # frames parsed with additionally registered record types are stored separately
+        key = key + registry_digest()
+        safe_key = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in key)
+        return '{}-{}'.format(self.fingerprint(file_name), safe_key)
+
+    def get(self, file_name, key):
+        """The cached frame for the log and key, or None."""
+        name = self._entry(file_name, key)
+        if name not in self.index['entries']:
+            return None
+        entry = self.index['entries'][name]
+        path = os.path.join(self.directory, name + entry['suffix'])
+        try:
+            df = pd.read_parquet(path) if entry['suffix'] == '.parquet' else pd.read_pickle(path)
+        except (OSError, ValueError):
+            self._remove([name])
+            return None
+        if entry.get('index'):
+            df = df.set_index(entry['index'])
+        entry['last_access'] = time.time()
+        self._write_index()
+        return df
+
+    def put(self, file_name, key, df):
+        name = self._entry(file_name, key)
+        self._remove([name])
+        suffix = '.pickle'
+        index = [] if isinstance(df.index, pd.RangeIndex) else list(df.index.names)
+        # index levels are stored as columns, which keeps their dtypes
+        storable = all(isinstance(level, str) and level not in df.columns for level in index) and \
+            len(set(index)) == len(index)
+        if parquet and storable:
+            try:
+                (df.reset_index() if index else df).to_parquet(os.path.join(self.directory, name + '.parquet'))
+                suffix = '.parquet'
+            except (ValueError, TypeError, pyarrow.ArrowException):
+                # e.g. non-string column labels of pivoted analyses
+                if os.path.exists(os.path.join(self.directory, name + '.parquet')):
+                    os.remove(os.path.join(self.directory, name + '.parquet'))
+        path = os.path.join(self.directory, name + suffix)
+        if suffix == '.pickle':
+            df.to_pickle(path)
+        self.index['entries'][name] = {'suffix': suffix, 'bytes': os.path.getsize(path),
+                                       'last_access': time.time(),
+                                       'index': index if suffix == '.parquet' else []}
+        self._evict()
+        self._write_index()
+
+    def cached(self, file_name, key, compute):
+        """Returns the cached frame, or computes, stores and returns it."""
+        df = self.get(file_name, key)
+        if df is None:
+            df = compute()
+            self.put(file_name, key, df)
+        return df
+
+    def size(self):
+        return sum(entry['bytes'] for entry in self.index['entries'].values())
+
+    def _evict(self):
+        entries = self.index['entries']
+        by_last_access = sorted(entries, key=lambda name: entries[name]['last_access'])
+        total = self.size()
+        evict = []
+        for name in by_last_access:
+            if total <= self.max_bytes:
+                break
+            total -= entries[name]['bytes']
+            evict.append(name)
+        self._remove(evict)
+
+    def _remove(self, names):
+        for name in list(names):
+            entry = self.index['entries'].pop(name, None)
+            if entry is None:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name + entry['suffix']))
+            except FileNotFoundError:
+                pass
+
+    def _write_index(self):
+        temporary = self.index_file + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.index, file)
+        os.replace(temporary, self.index_file)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012-2022, OpenGeoSys Community (http://www.opengeosys.org)
+#            Distributed under a Modified BSD License.
+#              See accompanying file LICENSE.txt or
+#              http://www.opengeosys.org/project/license
+
+"""Compares the performance of runs of the same model, e.g. before and after an update of OGS::
+
+    python -m ogs6py.log_parser.run_comparison baseline/out.log candidate/out.log --json verdict.json
+
+exits with 1 if a candidate is significantly slower than the baseline in any phase and with 3 if
+a candidate has too few time steps aligned with the baseline to decide (see `RunComparison`).
+"""
+
+import argparse
+import json
+import math
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from ogs6py.log_parser.common_ogs_analyses import fill_ogs_context, analysis_performance_breakdown
+from ogs6py.log_parser.log_parser import parse_file_to_dataframe
+
+phases = ['total_time', 'assembly_time', 'linear_solver_time', 'dirichlet_time', 'output_time', 'overhead_time',
+          'iterations']
+
+
+def run_time_steps(df):
+    """Phase times of each time step of a run (slowest mpi_process) and its simulated time."""
+    breakdown = analysis_performance_breakdown(df)
+    iterations = df['iteration_time'].notna().groupby([df['mpi_process'], df['time_step']]).sum()
+    breakdown['iterations'] = iterations.reindex(breakdown.index).to_numpy()
+    per_time_step = breakdown[phases].groupby(level='time_step').max()
+    # end time of the (last, accepted) attempt of the time step
+    starts = df[df['step_start_time'].notna()]
+    per_time_step['time'] = starts.groupby('time_step')['step_start_time'].last()
+    return per_time_step
+
+
+def holm_adjusted(p_values):
+    """Holm-Bonferroni adjusted p-values, for testing many phases at one significance level."""
+    p_values = np.asarray(p_values, dtype='float64')
+    order = np.argsort(p_values)
+    adjusted = np.maximum.accumulate((len(p_values) - np.arange(len(p_values))) * p_values[order])
+    result = np.empty_like(p_values)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+def signed_rank_test(differences):
+    """Two-sided p-value of the Wilcoxon signed-rank test (normal approximation with tie
+    and continuity correction) that the differences are symmetric about 0."""
+    differences = differences[differences != 0]
+    n = len(differences)
+    if n == 0:
+        return 1.0
+    ranks = pd.Series(np.abs(differences)).rank().to_numpy()
+    statistic = ranks[differences > 0].sum()
+    mean = n * (n + 1) / 4
+    _, ties = np.unique(np.abs(differences), return_counts=True)
+    variance = n * (n + 1) * (2 * n + 1) / 24 - (ties ** 3 - ties).sum() / 48
+    if variance <= 0:
+        return 1.0
+    z = (abs(statistic - mean) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0.0) / math.sqrt(2))
+
+
+@dataclass
+class RunComparison:
+    """Result of `compare_runs`.
+
+    table: per candidate run and phase the number of time steps with the phase measured in
+    both runs, the median time per time step of baseline and candidate, the relative change
+    (median ratio - 1), the p-value, the p-value adjusted for testing all phases of all runs
+    (Holm) and the verdict: 'regression', 'improvement', 'unchanged', 'not measured' (the
+    phase is in fewer than `minimum_time_steps` of the aligned time steps, e.g. output every
+    20th time step) or 'insufficient' (the run has fewer than `minimum_time_steps` time steps
+    aligned with the baseline).
+    verdict: 'regression' if any phase of any candidate regressed, otherwise 'insufficient'
+    if any candidate has too few aligned time steps (or there was no candidate), otherwise
+    'improvement' if any phase improved, otherwise 'unchanged'. Phases not measured do not
+    count, but nothing compared is never taken as unchanged.
+    """
+    baseline: str
+    table: pd.DataFrame
+    verdict: str
+    alpha: float
+    threshold: float
+
+    def to_dict(self):
+        """Machine readable result, e.g. for json.dump."""
+        results = self.table.reset_index().astype(object).where(self.table.reset_index().notna(), None)
+        return {'verdict': self.verdict, 'baseline': self.baseline, 'alpha': self.alpha,
+                'threshold': self.threshold, 'results': results.to_dict(orient='records')}
+
+    def __str__(self):
+        return 'Runs compared to {}: {}\n{}'.format(self.baseline, self.verdict, self.table.to_string())
+
+
+def compare_runs(runs, baseline=None, alpha=0.01, threshold=0.05, minimum_time_steps=5):
+    """Compares the time per time step of each phase of runs to the baseline run.
+
+    runs: {name: log file or context filled frame}, a list of log files or a frame of
+    `log_parser.parse_logs`; baseline: name of the baseline run, default the first. Time
+    steps are aligned by number and simulated time, steps that do not match (e.g. after a
+    change of the time stepping) are not compared. For each phase the log ratios of the
+    aligned time steps are tested with the signed-rank test; a change is significant if
+    the p-value, adjusted for the number of phases and runs tested (Holm), is below `alpha`
+    and the median ratio differs from 1 by at least `threshold`.
+    """
+    if isinstance(runs, pd.DataFrame):
+        runs = {run_id: run.droplevel('run_id') for run_id, run in runs.groupby(level='run_id', sort=False)}
+    elif not isinstance(runs, dict):
+        runs = {str(run): run for run in runs}
+    time_steps = {}
+    for name, run in runs.items():
+        df = run if isinstance(run, pd.DataFrame) else fill_ogs_context(parse_file_to_dataframe(run))
+        time_steps[name] = run_time_steps(df)
+    baseline = list(runs)[0] if baseline is None else baseline
+
+    rows = []
+    for name, candidate in time_steps.items():
+        if name == baseline:
+            continue
+        aligned = time_steps[baseline].join(candidate, how='inner', lsuffix='_baseline', rsuffix='_candidate')
+        aligned = aligned[np.isclose(aligned['time_baseline'], aligned['time_candidate'], rtol=1e-9, atol=0)]
+        for phase in phases:
+            before, after = aligned[phase + '_baseline'], aligned[phase + '_candidate']
+            valid = (before > 0) & (after > 0)
+            log_ratio = np.log((after[valid] / before[valid]).to_numpy(dtype='float64'))
+            if len(aligned) < minimum_time_steps:
+                verdict = 'insufficient'
+            elif len(log_ratio) < minimum_time_steps:
+                verdict = 'not measured'
+            else:
+                verdict = None  # tested below
+            rows.append({'run': name, 'phase': phase, 'time_steps': len(log_ratio),
+                         'baseline_median': before[valid].median(), 'candidate_median': after[valid].median(),
+                         'relative_change': math.expm1(np.median(log_ratio)) if len(log_ratio) else math.nan,
+                         'p_value': signed_rank_test(log_ratio), 'adjusted_p_value': math.nan, 'verdict': verdict})
+    table = pd.DataFrame(rows, columns=['run', 'phase', 'time_steps', 'baseline_median', 'candidate_median',
+                                        'relative_change', 'p_value', 'adjusted_p_value',
+                                        'verdict']).set_index(['run', 'phase'])
+    tested = table['verdict'].isna()
+    table.loc[tested, 'adjusted_p_value'] = holm_adjusted(table.loc[tested, 'p_value'])
+    significant = tested & (table['adjusted_p_value'] < alpha)
+    table.loc[tested, 'verdict'] = 'unchanged'
+    table.loc[significant & (table['relative_change'] >= threshold), 'verdict'] = 'regression'
+    table.loc[significant & (table['relative_change'] <= -threshold), 'verdict'] = 'improvement'
+    verdicts = set(table['verdict']) if len(table) else {'insufficient'}
+    verdict = next((verdict for verdict in ['regression', 'insufficient', 'improvement', 'unchanged']
+                    if verdict in verdicts), 'insufficient')
+    return RunComparison(baseline, table, verdict, alpha, threshold)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('logs', nargs='+', help='baseline log first, then the logs to compare to it')
+    arg_parser.add_argument('--alpha', type=float, default=0.01, help='significance level')
+    arg_parser.add_argument('--threshold', type=float, default=0.05, help='minimum relative change')
+    arg_parser.add_argument('--json', help='write the result to this json file')
+    args = arg_parser.parse_args()
+    if len(args.logs) < 2:
+        arg_parser.error('at least two logs are needed')
+    comparison = compare_runs(args.logs, alpha=args.alpha, threshold=args.threshold)
+    print(comparison)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(comparison.to_dict(), file, indent=2)
+    sys.exit({'regression': 1, 'insufficient': 3}.get(comparison.verdict, 0))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012-2022, OpenGeoSys Community (http://www.opengeosys.org)
+#            Distributed under a Modified BSD License.
+#              See accompanying file LICENSE.txt or
+#              http://www.opengeosys.org/project/license
+
+import hashlib
+import os
+import re
+
+import numpy as np
+
+_time_step_start = re.compile(rb'info: === Time stepping at step #(\d+) and time ([\d\.e+-]+) ')
+_rank_prefix = re.compile(rb'\[(\d+)\] ')
+
+
+def head_hash(file_name, number_of_bytes):
+    with open(file_name, 'rb') as file:
+        return hashlib.blake2b(file.read(number_of_bytes), digest_size=16).hexdigest()
+
+
+class TimeStepIndex:
+    """Byte offset, line number and time of the start of every time step, per mpi_process.
+
+    An entry is added for every 'Time stepping at step #' line (TimeStepStartTime). The index
+    is stored next to the log (`<log>.tsindex.npz`) and is then reused by `load`. If the log
+    has grown since, only the appended lines are scanned; if it was replaced, the index is rebuilt. Only
+    complete lines are indexed, so the index of a log that is still being written stays valid.
+    """
+
+    head_size = 1 << 16
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.time_step = np.empty(0, dtype=np.int64)
+        self.mpi_process = np.empty(0, dtype=np.int64)
+        self.offset = np.empty(0, dtype=np.int64)
+        self.line = np.empty(0, dtype=np.int64)
+        self.time = np.empty(0, dtype=np.float64)
+        # scanned_bytes and scanned_lines: the complete lines indexed so far
+        self.scanned_bytes = 0
+        self.scanned_lines = 0
+        self.head = head_hash(file_name, 0)
+
+    @staticmethod
+    def sidecar(file_name):
+        return file_name + '.tsindex.npz'
+
+    @classmethod
+    def load(cls, file_name, save=True):
+        """The index of the log, read from its sidecar file and updated, or built. A new or
+        updated index is written to the sidecar file unless `save` is False."""
+        index = None
+        try:
+            with np.load(cls.sidecar(file_name)) as stored:
+                index = cls(file_name)
+                for name in ['time_step', 'mpi_process', 'offset', 'line', 'time']:
+                    setattr(index, name, stored[name])
+                index.scanned_bytes, index.scanned_lines = (int(value) for value in stored['scanned'])
+                index.head = str(stored['head'])
+        except (OSError, KeyError, ValueError):
+            index = None
+        if index is None or not index.is_prefix_of_log():
+            index = cls(file_name)
+        if index.update() and save:
+            index.save()
+        return index
+
+    def is_prefix_of_log(self):
+        # the log still starts with the indexed bytes (it was not replaced or truncated)
+        return (os.path.getsize(self.file_name) >= self.scanned_bytes and
+                head_hash(self.file_name, min(self.scanned_bytes, self.head_size)) == self.head)
+
+    def update(self, block_size=1 << 24):
+        """Indexes the lines appended since the last update, returns whether there were any."""
+        offsets, lines, time_steps, ranks, times = [], [], [], [], []
+        scanned_bytes = self.scanned_bytes
+        with open(self.file_name, 'rb') as file:
+            file.seek(self.scanned_bytes)
+            while block := file.read(block_size):
+                block += file.readline()
+                if not block.endswith(b'\n'):
+                    # incomplete last line, indexed when it is complete
+                    block = block[:block.rfind(b'\n') + 1]
+                    if not block:
+                        break
+                line_start = 0
+                line_nr = self.scanned_lines
+                for match in _time_step_start.finditer(block):
+                    start = block.rfind(b'\n', 0, match.start()) + 1
+                    if start != match.start():
+                        prefix = _rank_prefix.fullmatch(block, start, match.start())
+                        if prefix is None:
+                            continue
+                        ranks.append(int(prefix.group(1)))
+                    else:
+                        ranks.append(0)
+                    line_nr += block.count(b'\n', line_start, start)
+                    line_start = start
+                    offsets.append(self.scanned_bytes + start)
+                    lines.append(line_nr + 1)
+                    time_steps.append(int(match.group(1)))
+                    times.append(float(match.group(2)))
+                self.scanned_bytes += len(block)
+                self.scanned_lines += block.count(b'\n')
+                if len(block) < block_size:
+                    break
+        if scanned_bytes < self.head_size:
+            self.head = head_hash(self.file_name, min(self.scanned_bytes, self.head_size))
+        if offsets:
+            self.time_step = np.concatenate([self.time_step, np.array(time_steps, dtype=np.int64)])
+            self.mpi_process = np.concatenate([self.mpi_process, np.array(ranks, dtype=np.int64)])
+            self.offset = np.concatenate([self.offset, np.array(offsets, dtype=np.int64)])
+            self.line = np.concatenate([self.line, np.array(lines, dtype=np.int64)])
+            self.time = np.concatenate([self.time, np.array(times, dtype=np.float64)])
+        return self.scanned_bytes > scanned_bytes
+
+    def save(self):
+        sidecar = self.sidecar(self.file_name)
+        temporary = sidecar + '.tmp'
+        try:
+            with open(temporary, 'wb') as file:
+                np.savez(file, time_step=self.time_step, mpi_process=self.mpi_process, offset=self.offset,
+                         line=self.line, time=self.time, scanned=np.array([self.scanned_bytes, self.scanned_lines]),
+                         head=np.array(self.head))
+            os.replace(temporary, sidecar)
+        except OSError:
+            pass  # e.g. a read-only directory, the index is only kept in memory
+
+    def byte_range(self, first, last):
+        """(start, end, line number at start) of the lines of the time steps first to last.
+
+        Starts at the first start of time step `first` of any mpi_process and ends before the
+        last start of the time step following `last` (the end of the indexed lines if an
+        mpi_process has not started it yet). Time step 0 (before the first time step) starts
+        at the beginning of the log.
+        """
+        if first <= 0:
+            start, start_line = 0, 1
+        else:
+            starts = np.flatnonzero(self.time_step >= first)
+            if len(starts) == 0:
+                return self.scanned_bytes, self.scanned_bytes, self.scanned_lines + 1
+            # entries are ordered by offset
+            start, start_line = int(self.offset[starts[0]]), int(self.line[starts[0]])
+        following = np.flatnonzero(self.time_step > last)
+        ranks, first_following = np.unique(self.mpi_process[following], return_index=True)
+        if len(ranks) < len(np.unique(self.mpi_process)) or len(ranks) == 0:
+            return start, self.scanned_bytes, start_line
+        return start, int(self.offset[following[first_following]].max()), start_line
+
+    def sample(self, maximum_lines=None, stride=None, time_window=None):
+        """Time steps for a quick look at a long log, to be parsed with `parse_time_steps`.
+
+        maximum_lines: the time steps completed by all mpi_processes within the first lines,
+        time_window: (begin, end) the time steps whose time (as in TimeStepStartTime) is in it,
+        stride: every stride-th of the remaining time steps. Time step 0 (before the first
+        time step) is only part of the head.
+        """
+        time_steps = np.unique(self.time_step)
+        if maximum_lines is not None and maximum_lines < self.scanned_lines:
+            # a time step is complete when each mpi_process has started a later one
+            within = self.line <= maximum_lines
+            ranks = np.unique(self.mpi_process)
+            started = [self.time_step[within & (self.mpi_process == rank)].max(initial=0) for rank in ranks]
+            time_steps = np.arange(min(started, default=0))
+        elif maximum_lines is not None:
+            time_steps = np.concatenate([[0], time_steps])
+        if time_window is not None:
+            begin, end = time_window
+            in_window = (self.time >= begin) & (self.time <= end)
+            time_steps = np.intersect1d(time_steps, self.time_step[in_window])
+        if stride is not None:
+            time_steps = time_steps[::stride]
+        return time_steps.tolist()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012-2022, OpenGeoSys Community (http://www.opengeosys.org)
+#            Distributed under a Modified BSD License.
+#              See accompanying file LICENSE.txt or
+#              http://www.opengeosys.org/project/license
+
+import pandas as pd
+
+from ogs6py.log_parser.common_ogs_analyses import RankBlocks, check_input, check_output, analysis_time_step, \
+    time_step_vs_iterations
+from ogs6py.log_parser.log_parser import iter_records, analysis_record_types, record_types_for
+
+
+class TimeStepStatistics:
+    """Per time step statistics of a log that is streamed as record frames (see `iter_records`).
+
+    Each pushed frame is reduced to sums, counts, maxima and last values per (mpi_process,
+    time_step) right away, no record is kept. The context (time_step forward filled and
+    iteration_number back filled per mpi_process, as in `fill_ogs_context`) is continued from
+    the previous frames by the last time step and the time steps still waiting for an
+    iteration number of each mpi_process. So memory depends on the number of time steps only,
+    not on the number of iterations. `time_step` and `time_step_vs_iterations` equal the
+    analyses `analysis_time_step` and `time_step_vs_iterations` of the whole log (up to the
+    rounding of sums added up frame by frame), `last_dx_x` is the last convergence criterion
+    |dx|/|x| of each time step.
+    """
+
+    # sorted, as the columns of pivot_table
+    mean_columns = ['output_time', 'step_size', 'time_step_solution_time']
+    sum_columns = ['assembly_time', 'dirichlet_time', 'linear_solver_time']
+    # partial results are combined after this many frames
+    compact_every = 64
+
+    def __init__(self):
+        self.columns = set()
+        # mpi_process -> last time step
+        self.last_time_step = {}
+        # mpi_process -> time steps with rows before the next iteration number
+        self.waiting = {}
+        self.partials = {'time_step': [], 'iterations': [], 'dx_x': []}
+
+    def push(self, df):
+        """Adds the records of the next frame of the log."""
+        if df.empty:
+            return
+        self.columns.update(df.columns)
+        ranks = df['mpi_process'].to_numpy(dtype='int64')
+        blocks = RankBlocks(df['mpi_process'])
+        time_steps = blocks.fill(df['time_step'], 'ffill') if 'time_step' in df else pd.Series(
+            pd.NA, index=df.index, dtype='Int64')
+        carried = pd.Series(ranks, index=df.index).map(self.last_time_step)
+        time_steps = time_steps.fillna(carried).fillna(0).astype('Int64')
+        self.last_time_step.update(time_steps.groupby(ranks).last().to_dict())
+        keys = [df['mpi_process'], time_steps.rename('time_step')]
+
+        columns = [column for column in [*self.mean_columns, *self.sum_columns] if column in df]
+        if columns:
+            values = df[columns]
+            counts = values.notna().groupby(keys).sum().add_suffix('_count')
+            self.partials['time_step'].append(pd.concat([values.groupby(keys).sum(), counts], axis=1))
+        if 'dx_x' in df:
+            self.partials['dx_x'].append(df['dx_x'].groupby(keys).last().dropna().to_frame())
+        self._push_iterations(df, ranks, blocks, time_steps)
+        if len(self.partials['time_step']) >= self.compact_every:
+            self._compact()
+
+    def _push_iterations(self, df, ranks, blocks, time_steps):
+        iteration_number = df['iteration_number'] if 'iteration_number' in df else pd.Series(
+            pd.NA, index=df.index, dtype='Int64')
+        filled = blocks.fill(iteration_number, 'bfill')
+        # the first iteration number of a mpi_process completes the time steps waiting for it
+        resolved = []
+        for rank, first in iteration_number.groupby(ranks).first().dropna().items():
+            resolved += [(time_step, first) for time_step in self.waiting.pop(rank, ())]
+        missing = filled.isna().to_numpy()
+        for rank in set(ranks[missing]):
+            self.waiting.setdefault(rank, set()).update(time_steps[missing & (ranks == rank)].unique())
+        iterations = filled.groupby(time_steps.rename('time_step')).max().dropna()
+        if resolved:
+            resolved = pd.Series([value for _, value in resolved], dtype='Int64', name='iteration_number',
+                                 index=pd.Index([time_step for time_step, _ in resolved], dtype='Int64',
+                                                name='time_step'))
+            iterations = pd.concat([iterations, resolved])
+        self.partials['iterations'].append(iterations.rename('iteration_number').to_frame())
+
+    def _compact(self):
+        aggregations = {'time_step': 'sum', 'iterations': 'max', 'dx_x': 'last'}
+        for name, partials in self.partials.items():
+            if partials:
+                combined = pd.concat(partials)
+                self.partials[name] = [combined.groupby(level=list(range(combined.index.nlevels)))
+                                       .agg(aggregations[name])]
+
+    def time_step(self):
+        """analysis_time_step"""
+        interest = [*self.mean_columns, *self.sum_columns]
+        context = ['mpi_process', 'time_step']
+        check_input(pd.DataFrame(columns=list(self.columns)), interest, context)
+        self._compact()
+        totals = self.partials['time_step'][0] if self.partials['time_step'] else pd.DataFrame(
+            columns=interest + [column + '_count' for column in interest])
+        means = pd.DataFrame({column: totals[column] / totals[column + '_count'] for column in self.mean_columns},
+                             index=totals.index).dropna(how='all')
+        dfe = means.merge(totals[self.sum_columns], left_index=True, right_index=True)
+        check_output(dfe, interest, context)
+        return dfe
+
+    def time_step_vs_iterations(self):
+        """time_step_vs_iterations"""
+        interest = ['iteration_number']
+        context = ['time_step']
+        check_input(pd.DataFrame(columns=list(self.columns)), interest, context)
+        self._compact()
+        pt = self.partials['iterations'][0].dropna() if self.partials['iterations'] else pd.DataFrame(
+            columns=interest)
+        check_output(pt, interest, context)
+        return pt
+
+    def last_dx_x(self):
+        """The last |dx|/|x| of each (mpi_process, time_step)."""
+        check_input(pd.DataFrame(columns=list(self.columns)), ['dx_x'], ['mpi_process', 'time_step'])
+        self._compact()
+        pt = self.partials['dx_x'][0] if self.partials['dx_x'] else pd.DataFrame(columns=['dx_x'])
+        check_output(pt, ['dx_x'], ['mpi_process', 'time_step'])
+        return pt
+
+
+def aggregate_time_steps(file_name, chunk_size=1 << 16, maximum_lines=None, force_parallel=False, progress=None):
+    """Streams the log in frames of `chunk_size` records into a `TimeStepStatistics`.
+
+    Only the records the statistics depend on are parsed (see `analysis_record_types`).
+    """
+    record_types = (analysis_record_types(analysis_time_step) | analysis_record_types(time_step_vs_iterations) |
+                    record_types_for(['dx_x']))
+    statistics = TimeStepStatistics()
+    for frame in iter_records(file_name, chunk_size=chunk_size, maximum_lines=maximum_lines,
+                              force_parallel=force_parallel, progress=progress, record_types=record_types):
+        statistics.push(frame)
+    return statistics
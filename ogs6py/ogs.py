@@ -12,11 +12,13 @@ Copyright (c) 2012-2021, OpenGeoSys Community (http://www.opengeosys.org)
 # pylint: disable=C0103, R0902, R0914, R0913
 
 import copy
+import hashlib
 import os
 import shutil
 import subprocess
 import sys
 import time
+import warnings
 from pathlib import Path
 from typing import Any
 
@@ -49,6 +51,11 @@ from ogs6py.classes.properties import (
 )
 import ogs6py.log_parser.log_parser as parser
 import ogs6py.log_parser.common_ogs_analyses as parse_fcts
+import ogs6py.log_parser.parse_cache as parse_cache
+import ogs6py.log_parser.time_step_index as time_step_index
+import ogs6py.log_parser.log_analysis as log_analysis
+import ogs6py.log_parser.time_step_statistics as time_step_statistics
+import ogs6py.log_parser.log_monitor as log_monitor
 
 
 class OGS:
@@ -1018,7 +1025,15 @@ class OGS:
     def parse_out(self, logfile: str | None = None,
                   filter: str | None = None,
                   maximum_lines: int | None = None,
-                  reset_index: bool = True) -> pd.DataFrame:
+                  reset_index: bool = True,
+                  chunk_size: int | None = None,
+                  workers: int | None = None,
+                  cache=None,
+                  by_rank: bool = False,
+                  time_steps=None,
+                  stride: int | None = None,
+                  time_window: tuple[float, float] | None = None,
+                  save_index: bool = True) -> pd.DataFrame:
         """Parses the logfile
 
         Parameters
@@ -1027,34 +1042,181 @@ class OGS:
             name of the log file
             Default: File specified already as logfile by runmodel
         maximum_lines : `int`
-            maximum number of lines to be evaluated
+            maximum number of lines to be evaluated (the head of the log);
+            combined with stride or time_window only the time steps
+            completed within these lines are selected
         filter : `str`, optional
             can be "by_time_step". "convergence_newton_iteration",
-            "convergence_coupling_iteration", or "time_step_vs_iterations"
+            "convergence_coupling_iteration", "time_step_vs_iterations",
+            "performance_breakdown" (see `performance_report`),
+            "mpi_imbalance" (see `mpi_imbalance_report`),
+            "convergence_order" (flags stagnating newton iterations),
+            "time_step_attempts" or "wasted_compute" (costs of rejected
+            time steps, see `wasted_compute_report`)
             if filter is None, the raw dataframe is returned.
+        chunk_size : `int`, optional
+            if given, the log is streamed in chunks of this many records
+            and the filter is applied per completed time steps, so memory
+            stays bounded for logs larger than RAM; "by_time_step" and
+            "time_step_vs_iterations" are aggregated while streaming (see
+            `TimeStepStatistics`)
+        workers : `int`, optional
+            number of processes parsing line aligned parts of the log
+            in parallel
+        cache : `str` or `ParseCache`, optional
+            cache directory; the result is stored there and reused until
+            the log file changes
+        by_rank : `bool`, optional
+            for logs of parallel runs: split the log into one stream per
+            mpi_process first and parse and fill the context of each
+            rank separately (in `workers` processes); logs of a single
+            mpi_process are parsed as without by_rank
+        time_steps : `range` or iterable of `int`, optional
+            parse only these time steps, e.g. range(10000, 10101); the
+            log is entered at their byte offset, looked up in an index
+            built by scanning the log (see `TimeStepIndex`), maximum_lines,
+            chunk_size and by_rank are not applied
+        stride : `int`, optional
+            parse only every stride-th time step, for a quick look at long
+            runs
+        time_window : (`float`, `float`), optional
+            parse only the time steps with a (simulation) time in
+            [begin, end]; can be combined with stride. stride and
+            time_window are not applied (with a warning) together with
+            time_steps or chunk_size, to compressed logs (they can not
+            be indexed) and to logs without time steps; then the whole
+            log (or its first maximum_lines) is parsed
+        save_index : `bool`, optional
+            store the time step index next to the log
+            (`<log>.tsindex.npz`), so that later calls with time_steps,
+            stride or time_window only scan the lines appended since;
+            with False the index is only kept for this call
+            Default: True
         """
         if logfile is None:
             logfile = self.logfile
-        records = parser.parse_file(logfile, maximum_lines=maximum_lines, force_parallel=False)
-        df = pd.DataFrame(records)
-
-        df = parse_fcts.fill_ogs_context(df)
         filterdict = {"by_time_step":parse_fcts.analysis_time_step,
                 "convergence_newton_iteration":parse_fcts.analysis_convergence_newton_iteration,
                 "convergence_coupling_iteration": parse_fcts.analysis_convergence_coupling_iteration,
                 "time_step_vs_iterations":  parse_fcts.time_step_vs_iterations,
                 "analysis_simulation": parse_fcts.analysis_simulation,
+                "performance_breakdown": parse_fcts.analysis_performance_breakdown,
+                "mpi_imbalance": parse_fcts.analysis_mpi_imbalance,
+                "convergence_order": parse_fcts.analysis_convergence_order,
+                "time_step_attempts": parse_fcts.analysis_time_step_attempts,
+                "wasted_compute": parse_fcts.analysis_wasted_compute,
                 "fill_ogs_context": parse_fcts.fill_ogs_context
                 }
-        if filter is not None:
-            try:
-                df = filterdict[filter](df)
-            except KeyError:
-                print("Filter not available")
+        # only the records an analysis depends on are parsed
+        record_types = None
+        if filterdict.get(filter) in parse_fcts.analysis_columns:
+            record_types = parser.analysis_record_types(filterdict[filter])
+
+        # quick looks: time steps selected with the time step index of the log
+        index = None
+        ignored = None
+        if stride is None and time_window is None:
+            pass
+        elif time_steps is not None:
+            ignored = "time_steps are given"
+        elif chunk_size is not None:
+            ignored = "the log is streamed in chunks"
+        elif parser.compression(logfile) is not None:
+            ignored = "compressed logs can not be indexed"
+        else:
+            index = time_step_index.TimeStepIndex.load(logfile, save=save_index)
+            if len(index.time_step) > 0:
+                time_steps = index.sample(maximum_lines, stride, time_window)
+            else:
+                ignored = "no time steps were found in the log"
+        if ignored is not None:
+            warnings.warn(f"stride and time_window are not applied, {ignored}: {logfile}", stacklevel=2)
+
+        def parse():
+            if chunk_size is not None and time_steps is None and filter in ("by_time_step",
+                                                                            "time_step_vs_iterations"):
+                # reduced to per time step sums while streaming, no records are kept
+                statistics = time_step_statistics.aggregate_time_steps(logfile, chunk_size=chunk_size,
+                                                                       maximum_lines=maximum_lines)
+                return statistics.time_step() if filter == "by_time_step" else statistics.time_step_vs_iterations()
+            if chunk_size is not None and time_steps is None:
+                frames = parse_fcts.iter_fill_ogs_context(parser.iter_records(
+                    logfile, chunk_size=chunk_size, maximum_lines=maximum_lines, record_types=record_types))
+                if filter in filterdict and filter != "fill_ogs_context":
+                    return parse_fcts.analyse_chunks(frames, filterdict[filter])
+                if filter not in (None, "fill_ogs_context"):
+                    print("Filter not available")
+                frames = list(frames)
+                return pd.concat(frames) if frames else pd.DataFrame()
+            if time_steps is not None:
+                df = parser.parse_time_steps(logfile, time_steps, record_types=record_types, index=index,
+                                             save_index=save_index)
+            elif by_rank and maximum_lines is None and parser.mpi_processes(logfile) > 1:
+                df = parser.parse_file_by_rank(logfile, workers=workers)
+            else:
+                df = parser.parse_file_to_dataframe(logfile, maximum_lines=maximum_lines,
+                                                    force_parallel=False, workers=workers,
+                                                    record_types=record_types)
+                df = parse_fcts.fill_ogs_context(df)
+            if filter is not None:
+                try:
+                    df = filterdict[filter](df)
+                except KeyError:
+                    print("Filter not available")
+            return df
+
+        if cache is None:
+            df = parse()
+        else:
+            # chunk_size and by_rank change how the result is computed (e.g. streamed frames)
+            key = f"parse_out-{filter}-{maximum_lines}-{chunk_size}-{by_rank}"
+            if time_steps is not None:
+                steps = ",".join(str(step) for step in sorted(set(time_steps)))
+                key += "-" + hashlib.blake2b(steps.encode(), digest_size=8).hexdigest()
+            df = parse_cache.ParseCache.of(cache).cached(logfile, key, parse)
         if reset_index is True:
             return df.reset_index()
         return df
 
+    def log_analysis(self, logfile: str | None = None, cache=None,
+                     workers: int | None = None) -> log_analysis.LogAnalysis:
+        """All analyses of the logfile from a single parse
+
+        The analyses (as for the filters of `parse_out`) are computed on
+        first access and kept, e.g. `log = model.log_analysis()`, then
+        `log.time_step`, `log.convergence_newton_iteration` or
+        `log["by_time_step"]`.
+
+        Parameters
+        ----------
+        logfile : `str`, optional
+            name of the log file
+            Default: File specified already as logfile by runmodel
+        cache : `str` or `ParseCache`, optional
+            cache directory for the parsed log, see `parse_out`
+        workers : `int`, optional
+            number of processes parsing the log in parallel
+        """
+        if logfile is None:
+            logfile = self.logfile
+        return log_analysis.LogAnalysis(logfile, cache=cache, workers=workers)
+
+    def log_monitor(self, logfile: str | None = None, **kwargs) -> log_monitor.LogMonitor:
+        """Detector of slowdowns in the log of a running simulation
+
+        e.g. `for anomaly in model.log_monitor().follow(interval=60):`,
+        see `LogMonitor` for the thresholds given as keyword arguments.
+
+        Parameters
+        ----------
+        logfile : `str`, optional
+            name of the log file
+            Default: File specified already as logfile by runmodel
+        """
+        if logfile is None:
+            logfile = self.logfile
+        return log_monitor.LogMonitor(logfile, **kwargs)
+
     def property_dataframe(
         self, mediamapping: dict[int, str] | None = None
     ) -> pd.DataFrame:
@@ -5,7 +5,9 @@
 #              See accompanying file LICENSE.txt or
 #              http://www.opengeosys.org/project/license
 
-from dataclasses import dataclass
+import hashlib
+import re
+from dataclasses import dataclass, is_dataclass
 
 class Info:
     @staticmethod
@@ -162,8 +164,52 @@ class WarningMessage(MPIProcess, WarningType):
     message: str
 
 
+# Record types added with register(), tried before the built-in ones
+_registered_regexes = []
+_registry_version = 0
+
+
+def register(regex, pattern_class):
+    """Adds a record type to `ogs_regexes()` without editing this module.
+
+    `pattern_class` is a dataclass derived from MPIProcess and one of Info, WarningType,
+    ErrorType or CriticalType. Its own fields (int, float or str) are filled with the groups
+    of `regex` in order. Registered patterns are tried before the built-in ones.
+    """
+    global _registry_version
+    if not (isinstance(pattern_class, type) and is_dataclass(pattern_class)
+            and issubclass(pattern_class, MPIProcess) and hasattr(pattern_class, 'type_str')):
+        raise Exception('{} is not a dataclass derived from MPIProcess and a log type like Info'.format(pattern_class))
+    types = list(pattern_class.__annotations__.values())
+    if not all(t in (int, float, str) for t in types):
+        raise Exception('Fields of {} must be int, float or str'.format(pattern_class.__name__))
+    if re.compile(regex).groups != len(types):
+        raise Exception('Number of groups in \'{}\' does not match the fields of {}'.format(regex, pattern_class.__name__))
+    _registered_regexes.append((regex, pattern_class))
+    _registry_version += 1
+
+
+def unregister(pattern_class):
+    global _registry_version
+    _registered_regexes[:] = [(regex, c) for regex, c in _registered_regexes if c is not pattern_class]
+    _registry_version += 1
+
+
+def registry_version():
+    """Changes whenever record types are registered or unregistered."""
+    return _registry_version
+
+
+def registry_digest():
+    """Identifies the registered record types across processes, '' if there are none."""
+    if not _registered_regexes:
+        return ''
+    key = '|'.join('{}={}.{}'.format(regex, c.__module__, c.__qualname__) for regex, c in _registered_regexes)
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
 def ogs_regexes():
-    return [("info: \[time\] Output of timestep (\d+) took ([\d\.e+-]+) s", TimeStepOutputTime),
+    return _registered_regexes + [("info: \[time\] Output of timestep (\d+) took ([\d\.e+-]+) s", TimeStepOutputTime),
             ("info: \[time\] Time step #(\d+) took ([\d\.e+-]+) s", TimeStepFinishedTime),
             ("info: \[time\] Reading the mesh took ([\d\.e+-]+) s", MeshReadTime),
             ("info: \[time\] Execution took ([\d\.e+-]+) s", SimulationExecutionTime),
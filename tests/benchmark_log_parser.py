@@ -0,0 +1,408 @@
+"""Throughput benchmarks for the log parser.
+
+Run from the repository root, e.g.::
+
+    python tests/benchmark_log_parser.py matcher
+"""
+
+import argparse
+import os
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from context import ogs6py
+import pandas as pd
+
+from ogs6py.log_parser.time_step_statistics import aggregate_time_steps
+from ogs6py.log_parser.log_parser import parse_file, parse_file_to_dataframe, parse_file_mmap, PatternMatcher, \
+    parse_file_by_rank, try_match_serial_line, analysis_record_types
+from ogs6py.log_parser.common_ogs_analyses import fill_ogs_context, analysis_time_step, \
+    analysis_convergence_newton_iteration, analysis_convergence_coupling_iteration, time_step_vs_iterations, \
+    analysis_simulation, analysis_simulation_termination, analysis_performance_breakdown, analysis_mpi_imbalance, \
+    analysis_convergence_order, analysis_time_step_attempts, analysis_wasted_compute, set_backend
+from log_generator import LogSpec, write_log
+from ogs6py.ogs_regexes.ogs_regexes import ogs_regexes
+
+LONG_LOG = 'tests/parser/serial_convergence_long.txt'
+
+
+def sequential_parse_file(file_name):
+    # Reference: one regex trial per pattern and line, as done before PatternMatcher
+    import re
+    patterns = [(re.compile(k), v) for k, v in ogs_regexes()]
+    records = []
+    with open(file_name) as file:
+        for line_nr, line in enumerate(file, start=1):
+            for key, value in patterns:
+                if r := try_match_serial_line(line, line_nr, key, value):
+                    records.append(value(*r))
+                    break
+    return records
+
+
+def grouped_fill_ogs_context(df):
+    # Reference: a groupby('mpi_process') and fillna per column, as done before the single pass
+    for column in ['line', 'mpi_process', 'time_step', 'iteration_number', 'coupling_iteration',
+                   'coupling_iteration_process', 'component', 'process']:
+        if column in df and df[column].dtype != 'Int64':
+            df[column] = df[column].astype('Int64')
+    grouped = df.groupby('mpi_process')
+    df['time_step'] = grouped[['time_step']].fillna(method='ffill').fillna(value=0)
+    df['iteration_number'] = grouped[['iteration_number']].fillna(method='bfill')
+    if 'component' in df:
+        df['component'] = grouped[['component']].fillna(value=-1)
+    if 'process' in df:
+        df['process'] = grouped[['process']].fillna(method='bfill')
+    if 'coupling_iteration_process' in df:
+        df['coupling_iteration_process'] = grouped[['coupling_iteration_process']].fillna(method='ffill', limit=1)
+    return df
+
+
+def count_lines(file_name):
+    with open(file_name) as file:
+        return sum(1 for _ in file)
+
+
+def inflated_log(file_name, copies):
+    # Temporary log made of `copies` concatenated copies of file_name, remove after use
+    with open(file_name) as file:
+        content = file.read()
+    handle, path = tempfile.mkstemp(suffix='.log')
+    with os.fdopen(handle, 'w') as file:
+        for _ in range(copies):
+            file.write(content)
+    return path
+
+
+def interleaved_log(file_name, ranks):
+    # Temporary parallel log of `ranks` processes all writing the lines of file_name
+    with open(file_name) as file:
+        lines = file.readlines()
+    handle, path = tempfile.mkstemp(suffix='.log')
+    with os.fdopen(handle, 'w') as file:
+        file.writelines(line for line in lines[:2] for _ in range(ranks))
+        for line in lines[2:]:
+            file.writelines('[{}] {}'.format(rank, line) for rank in range(ranks))
+    return path
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_memory(fn):
+    # Peak of the memory allocated while fn runs, numpy and pandas buffers included
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report(name, lines, seconds, peak=None):
+    memory = '  {:8.1f} MB peak'.format(peak / 1e6) if peak is not None else ''
+    print('{:<48} {:>12.0f} lines/s  ({:.4f} s){}'.format(name, lines / seconds, seconds, memory))
+
+
+def bench_matcher(args):
+    lines = count_lines(args.log)
+    report('sequential regex trials', lines, best_of(lambda: sequential_parse_file(args.log), args.repeat))
+    report('PatternMatcher (parse_file)', lines, best_of(lambda: parse_file(args.log), args.repeat))
+
+
+def bench_columnar(args):
+    lines = count_lines(args.log)
+    report('records + DataFrame + fill', lines,
+           best_of(lambda: fill_ogs_context(pd.DataFrame(parse_file(args.log))), args.repeat))
+    report('columnar DataFrame + fill', lines,
+           best_of(lambda: fill_ogs_context(parse_file_to_dataframe(args.log)), args.repeat))
+
+
+def bench_workers(args):
+    path = inflated_log(args.log, args.copies)
+    try:
+        lines = count_lines(path)
+        print('{} lines, {} CPUs'.format(lines, os.cpu_count()))
+        for workers in [1, 2, 4, 8]:
+            report('{} worker(s)'.format(workers), lines,
+                   best_of(lambda: parse_file_to_dataframe(path, workers=workers), args.repeat))
+    finally:
+        os.remove(path)
+
+
+def scan_text(file_name, regex):
+    with open(file_name) as file:
+        return sum(1 for line in file if regex.match(line))
+
+
+def scan_mmap(file_name, regex):
+    import mmap
+    with open(file_name, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return sum(1 for line in iter(buffer.readline, b'') if regex.match(line))
+
+
+def bench_mmap(args):
+    path = inflated_log(args.log, args.copies)
+    matcher = PatternMatcher(ogs_regexes())
+    try:
+        lines = count_lines(path)
+        report('scan only, text mode', lines, best_of(lambda: scan_text(path, matcher.regex), args.repeat))
+        report('scan only, mmap + bytes', lines, best_of(lambda: scan_mmap(path, matcher.bytes_regex), args.repeat))
+        report('text mode', lines, best_of(lambda: parse_file_to_dataframe(path), args.repeat))
+        report('mmap + bytes patterns', lines, best_of(lambda: parse_file_mmap(path), args.repeat))
+    finally:
+        os.remove(path)
+
+
+def bench_compressed(args):
+    import bz2
+    import gzip
+    import lzma
+    path = inflated_log(args.log, args.copies)
+    compressed = []
+    try:
+        lines = count_lines(path)
+        with open(path, 'rb') as file:
+            content = file.read()
+        report('uncompressed ({:.1f} MB)'.format(len(content) / 1e6), lines,
+               best_of(lambda: parse_file_to_dataframe(path), args.repeat))
+        for codec in [gzip, bz2, lzma]:
+            compressed.append(path + '.' + codec.__name__)
+            with codec.open(compressed[-1], 'wb') as file:
+                file.write(content)
+            size = os.path.getsize(compressed[-1])
+            report('{} ({:.1f} MB, {:.0f}x)'.format(codec.__name__, size / 1e6, len(content) / size), lines,
+                   best_of(lambda: parse_file_to_dataframe(compressed[-1]), args.repeat))
+    finally:
+        for file_name in [path] + compressed:
+            os.remove(file_name)
+
+
+def bench_ranks(args):
+    path = interleaved_log(args.log, args.ranks)
+    try:
+        lines = count_lines(path)
+        print('{} lines, {} ranks, {} CPUs'.format(lines, args.ranks, os.cpu_count()))
+        report('interleaved + fill', lines,
+               best_of(lambda: fill_ogs_context(parse_file_to_dataframe(path)), args.repeat))
+        for workers in [None, 2, 4]:
+            report('by rank, {} worker(s)'.format(workers or 1), lines,
+                   best_of(lambda: parse_file_by_rank(path, workers=workers), args.repeat))
+    finally:
+        os.remove(path)
+
+
+def bench_small_logs(args):
+    # Many small logs in one process (ensembles), matcher compiled per call vs once per process
+    from ogs6py.log_parser.log_parser import _read_frame
+    small_log = 'tests/parser/serial_info.txt'
+    lines = count_lines(small_log) * args.copies
+
+    def compile_per_call():
+        for _ in range(args.copies):
+            with open(small_log) as file:
+                _read_frame(file, PatternMatcher(ogs_regexes()))
+
+    report('compiled per call', lines, best_of(compile_per_call, args.repeat))
+    report('registry (parse_file_to_dataframe)', lines,
+           best_of(lambda: [parse_file_to_dataframe(small_log) for _ in range(args.copies)], args.repeat))
+
+
+def bench_selective(args):
+    # Parsing only the record types of an analysis vs. all of them, on a synthetic log
+    handle, path = tempfile.mkstemp(suffix='.log')
+    os.close(handle)
+    try:
+        lines = write_log(path, LogSpec(time_steps=args.time_steps * 10, components=2))
+        report('all record types', lines, best_of(lambda: parse_file_to_dataframe(path), args.repeat))
+        for name, analysis in ANALYSES.items():
+            record_types = analysis_record_types(analysis)
+            report(name, lines, best_of(lambda: parse_file_to_dataframe(path, record_types=record_types),
+                                        args.repeat))
+    finally:
+        os.remove(path)
+
+
+def bench_fill(args):
+    # fill_ogs_context on a frame of `copies` concatenated parses of a synthetic parallel log
+    handle, path = tempfile.mkstemp(suffix='.log')
+    os.close(handle)
+    try:
+        write_log(path, LogSpec(time_steps=args.time_steps // 10, ranks=4, components=2, coupling_iterations=2,
+                                processes=2))
+        raw = parse_file_to_dataframe(path)
+    finally:
+        os.remove(path)
+    raw = pd.concat([raw] * args.copies, ignore_index=True)
+    print('{} rows, {} mpi_processes'.format(len(raw), raw['mpi_process'].nunique()))
+    pd.testing.assert_frame_equal(fill_ogs_context(raw.copy()), grouped_fill_ogs_context(raw.copy()))
+    report('groupby + fillna per column', len(raw), best_of(lambda: grouped_fill_ogs_context(raw.copy()), args.repeat))
+    report('single pass (fill_ogs_context)', len(raw), best_of(lambda: fill_ogs_context(raw.copy()), args.repeat))
+
+
+def bench_backends(args):
+    # The analyses with each installed backend, on `copies` parses of a synthetic log with
+    # consecutive time steps
+    handle, path = tempfile.mkstemp(suffix='.log')
+    os.close(handle)
+    time_steps = args.time_steps // 10
+    try:
+        write_log(path, LogSpec(time_steps=time_steps, ranks=4, components=2, coupling_iterations=2, processes=2))
+        df = fill_ogs_context(parse_file_to_dataframe(path))
+    finally:
+        os.remove(path)
+    frames = []
+    for copy in range(args.copies):
+        frames.append(df.assign(time_step=df['time_step'] + copy * time_steps))
+    df = pd.concat(frames, ignore_index=True)
+    print('{} rows'.format(len(df)))
+    analyses = {name: analysis for name, analysis in ANALYSES.items() if name != 'analysis_simulation_termination'}
+    expected = {name: analysis(df) for name, analysis in analyses.items()}
+    for backend in ['pandas', 'arrow', 'polars']:
+        try:
+            set_backend(backend)
+        except Exception as e:
+            print(e)
+            continue
+        try:
+            for name, analysis in analyses.items():
+                pd.testing.assert_frame_equal(analysis(df), expected[name])
+                report('{} {}'.format(backend, name), len(df), best_of(lambda: analysis(df), args.repeat),
+                       peak_memory(lambda: analysis(df)))
+        finally:
+            set_backend('pandas')
+
+
+SCENARIOS = {'serial': dict(components=2, rejected_every=10, warnings_every=7),
+             'staggered': dict(coupling_iterations=3, processes=2, newton_iterations=2),
+             'mpi': dict(ranks=4, components=2)}
+
+ANALYSES = {'analysis_time_step': analysis_time_step,
+            'analysis_convergence_newton_iteration': analysis_convergence_newton_iteration,
+            'analysis_convergence_coupling_iteration': analysis_convergence_coupling_iteration,
+            'time_step_vs_iterations': time_step_vs_iterations,
+            'analysis_simulation': analysis_simulation,
+            'analysis_simulation_termination': analysis_simulation_termination,
+            'analysis_performance_breakdown': analysis_performance_breakdown,
+            'analysis_mpi_imbalance': analysis_mpi_imbalance,
+            'analysis_convergence_order': analysis_convergence_order,
+            'analysis_time_step_attempts': analysis_time_step_attempts,
+            'analysis_wasted_compute': analysis_wasted_compute}
+
+
+def bench_streaming(args):
+    # Time step statistics streamed into TimeStepStatistics vs. a full parse with context fill,
+    # on synthetic logs with few and many iterations per time step
+    def full(path):
+        df = fill_ogs_context(parse_file_to_dataframe(path))
+        return analysis_time_step(df), time_step_vs_iterations(df)
+
+    def streamed(path):
+        statistics = aggregate_time_steps(path)
+        return statistics.time_step(), statistics.time_step_vs_iterations()
+
+    for newton_iterations in [4, 40]:
+        handle, path = tempfile.mkstemp(suffix='.log')
+        os.close(handle)
+        try:
+            lines = write_log(path, LogSpec(time_steps=args.time_steps * 5, newton_iterations=newton_iterations,
+                                            ranks=2))
+            for expected, result in zip(full(path), streamed(path)):
+                pd.testing.assert_frame_equal(result, expected)
+            for name, fn in [('full parse', full), ('streamed', streamed)]:
+                report('{} ({} iterations per step)'.format(name, newton_iterations), lines,
+                       best_of(lambda: fn(path), args.repeat), peak_memory(lambda: fn(path)))
+        finally:
+            os.remove(path)
+
+
+def suite_steps(path):
+    # (name, function) of every measured step, analyses run on the context filled frame
+    raw = parse_file_to_dataframe(path)
+    df = fill_ogs_context(raw.copy())
+    steps = [('parse_file', lambda: parse_file(path)),
+             ('parse_file_to_dataframe', lambda: parse_file_to_dataframe(path)),
+             ('fill_ogs_context', lambda: fill_ogs_context(raw.copy()))]
+    for name, analysis in ANALYSES.items():
+        try:
+            analysis(df.copy())
+        except Exception:
+            continue  # e.g. no coupling iterations in the log
+        steps.append((name, lambda analysis=analysis: analysis(df.copy())))
+    return steps
+
+
+def bench_suite(args):
+    """All parse steps and analyses on synthetic logs (see log_generator.py).
+
+    With --save the results are written as json, with --compare they are checked against
+    such a file and the exit status is 1 if a step got slower by more than --tolerance.
+    """
+    results = {}
+    for scenario, spec in SCENARIOS.items():
+        handle, path = tempfile.mkstemp(suffix='.log')
+        os.close(handle)
+        try:
+            lines = write_log(path, LogSpec(time_steps=args.time_steps, **spec))
+            print('{}: {} lines'.format(scenario, lines))
+            for name, fn in suite_steps(path):
+                seconds = best_of(fn, args.repeat)
+                peak = peak_memory(fn)
+                report(name, lines, seconds, peak)
+                results['{}/{}'.format(scenario, name)] = {'lines_per_second': lines / seconds, 'peak_bytes': peak}
+        finally:
+            os.remove(path)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=1)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = [name for name, result in results.items() if name in baseline and
+                       result['lines_per_second'] < (1 - args.tolerance) * baseline[name]['lines_per_second']]
+        for name in regressions:
+            print('regression: {} {:.0f} lines/s (baseline {:.0f})'.format(
+                name, results[name]['lines_per_second'], baseline[name]['lines_per_second']))
+        if regressions:
+            sys.exit(1)
+
+
+BENCHMARKS = {'matcher': bench_matcher,
+              'columnar': bench_columnar,
+              'workers': bench_workers,
+              'mmap': bench_mmap,
+              'compressed': bench_compressed,
+              'ranks': bench_ranks,
+              'small_logs': bench_small_logs,
+              'selective': bench_selective,
+              'fill': bench_fill,
+              'backends': bench_backends,
+              'streaming': bench_streaming,
+              'suite': bench_suite}
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    arg_parser.add_argument('--log', default=LONG_LOG)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--copies', type=int, default=200,
+                            help='inflate the log by this many copies for large-file benchmarks')
+    arg_parser.add_argument('--ranks', type=int, default=512,
+                            help='number of mpi processes of the synthetic parallel log')
+    arg_parser.add_argument('--time-steps', type=int, default=200, help='time steps of the synthetic suite logs')
+    arg_parser.add_argument('--save', help='suite: write the results to this json file')
+    arg_parser.add_argument('--compare', help='suite: fail on regressions against this json file')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='suite: tolerated relative slowdown against --compare')
+    args = arg_parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
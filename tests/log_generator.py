@@ -0,0 +1,161 @@
+"""Synthetic OGS logs for tests and benchmarks of the log parser.
+
+The lines follow the formats of `ogs_regexes.py` (and the unmatched solver output in between),
+e.g.::
+
+    python tests/log_generator.py out.log --time-steps 1000 --ranks 4 --components 2
+"""
+
+import argparse
+import random
+from dataclasses import dataclass
+
+
+@dataclass
+class LogSpec:
+    time_steps: int = 10
+    newton_iterations: int = 4  # per time step, process and coupling iteration
+    coupling_iterations: int = 0  # 0: monolithic, otherwise staggered scheme
+    processes: int = 1  # processes of the staggered scheme
+    components: int = 0  # 0: one convergence criterion per iteration, otherwise one per component
+    ranks: int = 1  # > 1: lines of all mpi processes interleaved, with [rank] prefix
+    rejected_every: int = 0  # every n-th time step is rejected once and repeated
+    warnings_every: int = 0  # a warning in every n-th time step
+    seed: int = 0
+
+
+_solver_output = ['info: ------------------------------------------------------------------\n',
+                  'info: *** Eigen solver computation\n',
+                  'info: -> solve with BiCGSTAB (precon DIAGONAL)\n',
+                  'info: \t iteration: {iterations}/10000\n',
+                  'info: \t residual: {residual:e}\n',
+                  'info: ------------------------------------------------------------------\n']
+
+
+def _seconds(rng, scale):
+    return '{:.6g}'.format(scale * rng.uniform(0.5, 1.5))
+
+
+def _convergence_lines(rng, spec, dx_x):
+    x = 1.2e7 * rng.uniform(0.9, 1.1)
+    if spec.components == 0:
+        return ['info: Convergence criterion: |dx|={:.4e}, |x|={:.4e}, |dx|/|x|={:.4e}\n'.format(dx_x * x, x, dx_x)]
+    return ['info: Convergence criterion, component {}: |dx|={:.4e}, |x|={:.4e}, |dx|/|x|={:.4e}\n'.format(
+        component, dx_x * x * (component + 1), x * (component + 1), dx_x) for component in range(spec.components)]
+
+
+def _newton(rng, spec, fail=False):
+    lines = []
+    dx_x = rng.uniform(1e-3, 1e-1)
+    for iteration in range(1, spec.newton_iterations + 1):
+        lines.append('info: [time] Assembly took {} s.\n'.format(_seconds(rng, 1e-3)))
+        lines.append('info: [time] Applying Dirichlet BCs took {} s.\n'.format(_seconds(rng, 1e-5)))
+        lines += [line.format(iterations=rng.randint(3, 60), residual=rng.uniform(1e-17, 1e-10))
+                  for line in _solver_output]
+        lines.append('info: [time] Linear solver took {} s.\n'.format(_seconds(rng, 1e-3)))
+        lines += _convergence_lines(rng, spec, dx_x)
+        lines.append('info: [time] Iteration #{} took {} s.\n'.format(iteration, _seconds(rng, 3e-3)))
+        # diverging instead of quadratic convergence before a rejected time step
+        dx_x = dx_x * 2 if fail else dx_x ** 1.6
+    return lines
+
+
+def _time_step(rng, spec, time_step, t, dt, fail):
+    lines = ['info: === Time stepping at step #{} and time {:.6g} with step size {:.6g}\n'.format(time_step, t + dt, dt)]
+    if spec.warnings_every and time_step % spec.warnings_every == 0:
+        lines.append('warning: Linear solver reached the maximum number of iterations in time step #{}.\n'.format(
+            time_step))
+    if spec.coupling_iterations == 0:
+        for process in range(spec.processes):
+            lines += _newton(rng, spec, fail)
+            lines.append('info: [time] Solving process #{} took {} s in time step #{} \n'.format(
+                process, _seconds(rng, 2e-2), time_step))
+    else:
+        for coupling_iteration in range(1, spec.coupling_iterations + 1):
+            for process in range(spec.processes):
+                lines += _newton(rng, spec, fail)
+                lines.append('info: [time] Solving process #{} took {} s in time step #{}  coupling iteration #{}\n'
+                             .format(process, _seconds(rng, 2e-2), time_step, coupling_iteration))
+                lines.append('info: ------- Checking convergence criterion for coupled solution of process #{} '
+                             '-------\n'.format(process))
+                lines += _convergence_lines(rng, LogSpec(components=0), 10.0 ** -(3 * coupling_iteration))
+    if fail:
+        lines.append('error: The nonlinear solver failed in time step #{} at t = {:.6g} s for process #0.\n'.format(
+            time_step, t + dt))
+    lines.append('info: [time] Time step #{} took {} s.\n'.format(time_step, _seconds(rng, 5e-2)))
+    if fail:
+        lines.append('warning: Time step will be rejected due to nonlinear solver divergence.\n')
+        lines.append('warning: Time step {} was rejected 1 times and it will be repeated with a reduced step '
+                     'size.\n'.format(time_step))
+    else:
+        lines.append('info: [time] Output of timestep {} took {} s.\n'.format(time_step, _seconds(rng, 1e-3)))
+    return lines
+
+
+def _rank_lines(spec, rank):
+    # The lines of one mpi process after the header
+    rng = random.Random(spec.seed * 7919 + rank)
+    yield 'info: Initialize processes.\n'
+    yield 'info: Solve processes.\n'
+    yield 'info: [time] Output of timestep 0 took {} s.\n'.format(_seconds(rng, 1e-3))
+    t, dt = 0.0, 86400.0
+    for time_step in range(1, spec.time_steps + 1):
+        if spec.rejected_every and time_step % spec.rejected_every == 0:
+            yield from _time_step(rng, spec, time_step, t, dt, fail=True)
+            dt = dt / 2
+        yield from _time_step(rng, spec, time_step, t, dt, fail=False)
+        t = t + dt
+    yield 'info: The whole computation of the time stepping took {} steps, in which\n'.format(spec.time_steps)
+    yield '\t the accepted steps are {}, and the rejected steps are {}.\n'.format(
+        spec.time_steps, spec.time_steps // spec.rejected_every if spec.rejected_every else 0)
+    yield '\n'
+    yield 'info: [time] Execution took {} s.\n'.format(_seconds(rng, 1e-2 * spec.time_steps))
+    yield 'info: OGS terminated on 2022-01-01 00:00:00+0100.\n'
+
+
+def generate_log(file, spec=None, **kwargs):
+    """Writes a synthetic log to the text file object, returns the number of lines.
+
+    Either a LogSpec or its fields as keyword arguments. The lines of several ranks are
+    interleaved in blocks of random length, as written by concurrent mpi processes.
+    """
+    spec = spec or LogSpec(**kwargs)
+    header = ['info: This is OpenGeoSys-6 version 6.4.1-synthetic.\n', 'info: OGS started on 2022-01-01 00:00:00+0100.\n']
+    if spec.ranks == 1:
+        file.writelines(header)
+        number_of_lines = len(header)
+        for line in _rank_lines(spec, 0):
+            file.write(line)
+            number_of_lines += 1
+        return number_of_lines
+
+    for line in header:
+        file.writelines([line] * spec.ranks)
+    number_of_lines = len(header) * spec.ranks
+    rng = random.Random(spec.seed)
+    streams = [(rank, _rank_lines(spec, rank)) for rank in range(spec.ranks)]
+    while streams:
+        index = rng.randrange(len(streams))
+        rank, lines = streams[index]
+        for _ in range(rng.randint(1, 8)):
+            line = next(lines, None)
+            if line is None:
+                del streams[index]
+                break
+            file.write('[{}] {}'.format(rank, line))
+            number_of_lines += 1
+    return number_of_lines
+
+
+def write_log(file_name, spec=None, **kwargs):
+    with open(file_name, 'w') as file:
+        return generate_log(file, spec, **kwargs)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('file_name')
+    for name, default in vars(LogSpec()).items():
+        arg_parser.add_argument('--' + name.replace('_', '-'), type=int, default=default)
+    args = vars(arg_parser.parse_args())
+    print(write_log(args.pop('file_name'), **args), 'lines')
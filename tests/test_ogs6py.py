@@ -1,20 +1,47 @@
 import unittest
 
+import numpy as np
 import pandas as pd
 
 import tempfile
+import glob
 import os
+import sys
+import subprocess
 import shutil
 import hashlib
+import json
+import gzip
+import lzma
+import bz2
+from unittest import mock
 from lxml import etree as ET
 
 from context import ogs6py
-from ogs6py.log_parser.log_parser import parse_file
+from ogs6py.log_parser.log_parser import parse_file, parse_file_to_dataframe, parse_file_mmap, iter_records, \
+    mpi_processes, pattern_matcher, RankFrames, parse_file_by_rank, ParseProgress, IncrementalLogParser, try_match_serial_line, try_match_parallel_line, \
+    analysis_record_types, select_patterns, parse_time_steps, parse_logs, demultiplex_ranks
+from ogs6py.log_parser import time_step_index
+from ogs6py.log_parser.time_step_index import TimeStepIndex
+from ogs6py.log_parser.log_analysis import LogAnalysis
+from ogs6py.log_parser.log_monitor import LogMonitor
+from ogs6py.log_parser.run_comparison import compare_runs, signed_rank_test
+from ogs6py.log_parser.time_step_statistics import TimeStepStatistics, aggregate_time_steps
+from ogs6py.log_parser.parse_cache import ParseCache
+from log_generator import write_log
+from ogs6py.ogs_regexes.ogs_regexes import ogs_regexes, register, unregister, MPIProcess, Info, \
+    TimeStepSolutionTime
 # this needs to be replaced with regexes from specific ogs version
 from collections import namedtuple, defaultdict
+from dataclasses import dataclass
+from ogs6py.log_parser import common_ogs_analyses
 from ogs6py.log_parser.common_ogs_analyses import fill_ogs_context, analysis_time_step, \
     analysis_convergence_newton_iteration, analysis_convergence_coupling_iteration, analysis_simulation_termination, \
-    time_step_vs_iterations
+    time_step_vs_iterations, iter_fill_ogs_context, analyse_chunks, analysis_columns, analysis_simulation, \
+    set_backend, analyse_runs, analysis_performance_breakdown, performance_report, \
+    analysis_mpi_imbalance, mpi_imbalance_report, analysis_convergence_order, \
+    analysis_time_step_attempts, analysis_wasted_compute, wasted_compute_report, time_step_attempts, \
+    MissingColumnsError
 
 
 def log_types(records):
@@ -802,5 +829,677 @@ class TestiOGS(unittest.TestCase):
             dfe.at[10, 'iteration_number'], 5)
 
 
+    def test_pattern_matcher_equals_sequential_trials(self):
+        import re
+        for filename, parallel in [('tests/parser/serial_convergence_long.txt', False),
+                                   ('tests/parser/serial_time_step_rejected.txt', False),
+                                   ('tests/parser/parallel_3_debug.txt', True)]:
+            prefix, try_match = ('\\[(\\d+)\\]\\ ', try_match_parallel_line) if parallel else ('', try_match_serial_line)
+            patterns = [(re.compile(prefix + k), v) for k, v in ogs_regexes()]
+            expected = []
+            with open(filename) as file:
+                for line_nr, line in enumerate(file, start=1):
+                    for key, value in patterns:
+                        if r := try_match(line, line_nr, key, value):
+                            expected.append(value(*r))
+                            break
+            records = parse_file(filename)
+            self.assertEqual([type(r) for r in records], [type(r) for r in expected])
+            pd.testing.assert_frame_equal(pd.DataFrame(records), pd.DataFrame(expected))
+
+    def test_parse_file_to_dataframe(self):
+        for filename in ['tests/parser/serial_convergence_long.txt', 'tests/parser/parallel_3_debug.txt',
+                         'tests/parser/serial_time_step_rejected.txt']:
+            df = parse_file_to_dataframe(filename)
+            self.assertEqual(df['type'].dtype, 'category')
+            self.assertEqual(df['time_step'].dtype, 'Int64')
+            expected = fill_ogs_context(pd.DataFrame(parse_file(filename)))
+            expected['type'] = expected['type'].astype('category')
+            pd.testing.assert_frame_equal(fill_ogs_context(df), expected)
+
+    def test_iter_records_chunks(self):
+        filename = 'tests/parser/serial_convergence_long.txt'
+        progress = ParseProgress()
+        records = list(iter_records(filename, progress=progress))
+        self.assertEqual(len(records), len(parse_file(filename)))
+        self.assertEqual(progress.lines_read, 3416)
+        self.assertEqual(progress.bytes_read, progress.total_bytes)
+
+        expected = fill_ogs_context(parse_file_to_dataframe(filename))
+        for chunk_size in [50, 1000]:
+            frames = list(iter_fill_ogs_context(iter_records(filename, chunk_size=chunk_size)))
+            self.assertGreater(len(frames), 1)
+            df = pd.concat(frames)
+            df['component'] = df['component'].fillna(-1)
+            pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+
+    def test_analyse_chunks(self):
+        for filename in ['tests/parser/serial_convergence_long.txt', 'tests/parser/parallel_3_debug.txt']:
+            df = fill_ogs_context(parse_file_to_dataframe(filename))
+            for analysis in [analysis_time_step, time_step_vs_iterations]:
+                chunked = analyse_chunks(iter_fill_ogs_context(iter_records(filename, chunk_size=50)), analysis)
+                pd.testing.assert_frame_equal(chunked, analysis(df))
+        model = ogs6py.OGS(PROJECT_FILE="tests/test_parse_out.prj")
+        filename = 'tests/parser/serial_convergence_long.txt'
+        for filter in ["convergence_newton_iteration", "convergence_coupling_iteration"]:
+            pd.testing.assert_frame_equal(model.parse_out(filename, filter=filter, chunk_size=100),
+                                          model.parse_out(filename, filter=filter))
+        # chunks without values of interest are skipped, errors of the analysis are raised
+        frames = list(iter_fill_ogs_context(iter_records(filename, chunk_size=50)))
+        with self.assertRaises(MissingColumnsError):
+            analyse_chunks(frames, lambda frame: analysis_time_step(frame.drop(columns='assembly_time')))
+
+        def failing(frame):
+            if frame['time_step'].max() > 5:
+                raise TypeError('bug in the analysis')
+            return analysis_time_step(frame)
+        with self.assertRaises(TypeError):
+            analyse_chunks(frames, failing)
+        with self.assertRaisesRegex(MissingColumnsError, r'context \(time_step\)'):
+            analysis_time_step(frames[-1].drop(columns='time_step'))
+        # a log without records streams no frames
+        with tempfile.TemporaryDirectory() as tmpdir:
+            empty = os.path.join(tmpdir, 'empty.log')
+            open(empty, 'w').close()
+            self.assertTrue(model.parse_out(empty, chunk_size=100, reset_index=False).empty)
+
+    def test_parse_file_workers(self):
+        for filename in ['tests/parser/serial_convergence_long.txt', 'tests/parser/parallel_3_debug.txt']:
+            df = parse_file_to_dataframe(filename, workers=3)
+            pd.testing.assert_frame_equal(fill_ogs_context(df), fill_ogs_context(parse_file_to_dataframe(filename)))
+            pd.testing.assert_frame_equal(pd.DataFrame(parse_file(filename, workers=3)),
+                                          pd.DataFrame(parse_file(filename)))
+
+    def test_parse_file_mmap(self):
+        for filename in ['tests/parser/serial_convergence_long.txt', 'tests/parser/parallel_3_debug.txt',
+                         'tests/parser/serial_critical.txt']:
+            pd.testing.assert_frame_equal(parse_file_mmap(filename), parse_file_to_dataframe(filename))
+            pd.testing.assert_frame_equal(pd.DataFrame(parse_file_mmap(filename, as_dataframe=False)),
+                                          pd.DataFrame(parse_file(filename)))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for filename in ['tests/parser/serial_convergence_long.txt', 'tests/parser/parallel_3_debug.txt']:
+                logfile = os.path.join(tmpdir, 'crlf.log')
+                with open(filename, 'rb') as file, open(logfile, 'wb') as crlf:
+                    crlf.write(file.read().replace(b'\n', b'\r\n'))
+                df = parse_file_mmap(logfile)
+                pd.testing.assert_frame_equal(df, parse_file_to_dataframe(filename))
+                pd.testing.assert_frame_equal(parse_file_to_dataframe(logfile), df)
+
+    def test_incremental_log_parser(self):
+        filename = 'tests/parser/serial_convergence_long.txt'
+        with open(filename, 'rb') as file:
+            content = file.read()
+        expected = fill_ogs_context(parse_file_to_dataframe(filename))
+        # pieces of the CRLF log also end between '\r' and '\n'
+        for content, piece in [(content, 7777), (content.replace(b'\n', b'\r\n'), 7778)]:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                logfile = os.path.join(tmpdir, 'out.log')
+                statefile = os.path.join(tmpdir, 'state.pickle')
+                open(logfile, 'wb').close()
+                log_parser = IncrementalLogParser(logfile)
+                deltas = []
+                # appended pieces end in the middle of lines
+                for start in range(0, len(content), piece):
+                    with open(logfile, 'ab') as file:
+                        file.write(content[start:start + piece])
+                    deltas.append(log_parser.update())
+                    log_parser.save(statefile)
+                    log_parser = IncrementalLogParser.load(statefile)
+                self.assertEqual(len(log_parser.update()), 0)
+                deltas.append(log_parser.flush())
+                self.assertEqual(log_parser.offset, len(content))
+            df = pd.concat([delta for delta in deltas if not delta.empty])
+            df['component'] = df['component'].fillna(-1)
+            pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+
+    def test_parse_cache(self):
+        model = ogs6py.OGS(PROJECT_FILE="tests/test_parse_out.prj")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            logfile = os.path.join(tmpdir, 'out.log')
+            shutil.copyfile('tests/parser/serial_convergence_long.txt', logfile)
+            cachedir = os.path.join(tmpdir, 'cache')
+            for filter in [None, "by_time_step", "time_step_vs_iterations"]:
+                df = model.parse_out(logfile, filter=filter, cache=cachedir)
+                pd.testing.assert_frame_equal(df, model.parse_out(logfile, filter=filter))
+                pd.testing.assert_frame_equal(model.parse_out(logfile, filter=filter, cache=cachedir), df)
+            # the nullable index levels of analyses are kept on a cache hit
+            pd.testing.assert_frame_equal(
+                model.parse_out(logfile, filter="by_time_step", reset_index=False, cache=cachedir),
+                model.parse_out(logfile, filter="by_time_step", reset_index=False))
+            cache = ParseCache(cachedir)
+            self.assertEqual(len(cache.index['entries']), 3)
+            # other modes of parsing are cached separately
+            streamed = model.parse_out(logfile, chunk_size=100, cache=cachedir)
+            pd.testing.assert_frame_equal(streamed, model.parse_out(logfile, chunk_size=100))
+            pd.testing.assert_frame_equal(model.parse_out(logfile, by_rank=True, cache=cachedir),
+                                          model.parse_out(logfile, by_rank=True))
+            cache = ParseCache(cachedir)
+            self.assertEqual(len(cache.index['entries']), 5)
+            df = parse_file_to_dataframe(logfile, cache=cache)
+            pd.testing.assert_frame_equal(cache.get(logfile, 'parse_file-None-False'), df)
+            # a modified log invalidates all its entries
+            with open(logfile, 'a') as file:
+                file.write('info: [time] Linear solver took 0.1 s\n')
+            self.assertIsNone(cache.get(logfile, 'parse_file-None-False'))
+            self.assertEqual(len(cache.index['entries']), 0)
+            self.assertEqual(len(parse_file_to_dataframe(logfile, cache=cache)), len(df) + 1)
+            # least recently used entries are evicted beyond max_bytes
+            cache.max_bytes = cache.size()
+            parse_file_to_dataframe(logfile, maximum_lines=100, cache=cache)
+            self.assertEqual(list(cache.index['entries']), [cache._entry(logfile, 'parse_file-100-False')])
+
+    def test_parse_compressed_log(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for filename in ['tests/parser/serial_convergence_long.txt', 'tests/parser/parallel_3_debug.txt']:
+                with open(filename, 'rb') as file:
+                    content = file.read()
+                df = parse_file_to_dataframe(filename)
+                for codec in [gzip, lzma, bz2]:
+                    compressed = os.path.join(tmpdir, 'out.log.' + codec.__name__)
+                    with codec.open(compressed, 'wb') as file:
+                        file.write(content)
+                    self.assertEqual(mpi_processes(compressed), mpi_processes(filename))
+                    pd.testing.assert_frame_equal(parse_file_to_dataframe(compressed, workers=2), df)
+                    pd.testing.assert_frame_equal(parse_file_mmap(compressed), df)
+                    pd.testing.assert_frame_equal(pd.DataFrame(parse_file(compressed)),
+                                                  pd.DataFrame(parse_file(filename)))
+                    progress = ParseProgress()
+                    self.assertEqual(sum(len(chunk) for chunk in iter_records(compressed, 500, progress=progress)),
+                                     len(df))
+                    self.assertEqual(progress.fraction, 1.0)
+
+    def test_parse_file_by_rank(self):
+        model = ogs6py.OGS(PROJECT_FILE="tests/test_parse_out.prj")
+        with open('tests/parser/serial_convergence_long.txt') as file:
+            lines = file.readlines()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # three ranks writing the lines of a serial log interleaved
+            logfile = os.path.join(tmpdir, 'out.log')
+            with open(logfile, 'w') as file:
+                file.writelines(line for line in lines[:2] for _ in range(3))
+                file.writelines('[{}] {}'.format(rank, line) for line in lines[2:] for rank in range(3))
+            for filename in ['tests/parser/parallel_3_debug.txt', logfile]:
+                df = fill_ogs_context(parse_file_to_dataframe(filename))
+                pd.testing.assert_frame_equal(parse_file_by_rank(filename), df)
+                pd.testing.assert_frame_equal(parse_file_by_rank(filename, workers=2), df)
+                rank_frames = RankFrames(filename)
+                self.assertEqual(list(rank_frames), [0, 1, 2])
+                pd.testing.assert_frame_equal(rank_frames[1],
+                                              df[df['mpi_process'] == 1].reset_index(drop=True),
+                                              check_categorical=False)
+                self.assertEqual(list(rank_frames.frames), [1])
+                pd.testing.assert_frame_equal(rank_frames.to_dataframe(), df)
+            # compressed and CRLF logs, the header and lines with another prefix are dropped
+            with open(logfile, 'rb') as file:
+                content = file.read()
+            df = fill_ogs_context(parse_file_to_dataframe(logfile))
+            with gzip.open(logfile + '.gz', 'wb') as file:
+                file.write(content)
+            with open(logfile + '.crlf', 'wb') as file:
+                file.write(content.replace(b'\n', b'\r\n') + b'[x] info: no rank\r\n[12')
+            for filename in [logfile + '.gz', logfile + '.crlf']:
+                pd.testing.assert_frame_equal(parse_file_by_rank(filename, workers=2), df)
+            self.assertEqual(demultiplex_ranks(b''), {})
+            pd.testing.assert_frame_equal(model.parse_out(logfile, filter="by_time_step", by_rank=True),
+                                          model.parse_out(logfile, filter="by_time_step"))
+        # logs of a single mpi_process are parsed as without by_rank
+        for filename in sorted(glob.glob('tests/parser/serial_*.txt')):
+            pd.testing.assert_frame_equal(parse_file_by_rank(filename, fill_context=False),
+                                          parse_file_to_dataframe(filename))
+            try:
+                expected = model.parse_out(filename)
+            except KeyError:
+                # no time step in the log (e.g. serial_critical.txt), by_rank fails the same way
+                with self.assertRaises(KeyError):
+                    model.parse_out(filename, by_rank=True)
+                continue
+            pd.testing.assert_frame_equal(model.parse_out(filename, by_rank=True), expected)
+        filename = 'tests/parser/serial_convergence_long.txt'
+        pd.testing.assert_frame_equal(model.parse_out(filename, filter="by_time_step", by_rank=True),
+                                      model.parse_out(filename, filter="by_time_step"))
+
+    def test_register_record_type(self):
+        @dataclass
+        class TimeSteppingSummary(MPIProcess, Info):
+            number_of_time_steps: int
+        filename = 'tests/parser/serial_convergence_long.txt'
+        self.assertIs(pattern_matcher(), pattern_matcher())
+        with self.assertRaises(Exception):
+            register("info: The whole computation of the time stepping took (\\d+) steps, in (\\d+)",
+                     TimeSteppingSummary)
+        register("info: The whole computation of the time stepping took (\\d+) steps", TimeSteppingSummary)
+        try:
+            df = parse_file_to_dataframe(filename)
+            self.assertEqual(df['number_of_time_steps'].dropna().tolist(), [10])
+            self.assertEqual(pd.DataFrame(parse_file(filename))['number_of_time_steps'].dropna().tolist(), [10])
+        finally:
+            unregister(TimeSteppingSummary)
+        self.assertNotIn('number_of_time_steps', parse_file_to_dataframe(filename))
+
+    def test_log_generator(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            logfile = os.path.join(tmpdir, 'out.log')
+            write_log(logfile, time_steps=5, newton_iterations=3, components=2, rejected_every=2, warnings_every=3)
+            df = fill_ogs_context(parse_file_to_dataframe(logfile))
+            self.assertEqual(time_step_vs_iterations(df)['iteration_number'].loc[1:].tolist(), [3] * 5)
+            self.assertEqual((df['type'] == 'Error').sum(), 2)
+            self.assertEqual((df['type'] == 'Warning').sum(), 5)
+            self.assertEqual(sorted(df['component'].dropna().unique()), [-1, 0, 1])
+
+            write_log(logfile, time_steps=4, coupling_iterations=3, processes=2, ranks=3)
+            self.assertEqual(mpi_processes(logfile), 3)
+            df = fill_ogs_context(parse_file_to_dataframe(logfile))
+            pd.testing.assert_frame_equal(parse_file_by_rank(logfile), df)
+            pt = analysis_convergence_coupling_iteration(df)
+            self.assertEqual(len(pt), 4 * 3 * 2)
+            # time steps 0 (initial output) to 4 of each rank
+            self.assertEqual(len(analysis_time_step(df)), 3 * 5)
+
+    def test_selective_parsing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            logfile = os.path.join(tmpdir, 'out.log')
+            write_log(logfile, time_steps=4, coupling_iterations=2, processes=2, components=2, rejected_every=3)
+            for filename in ['tests/parser/serial_convergence_long.txt', logfile]:
+                df = fill_ogs_context(parse_file_to_dataframe(filename))
+                for analysis in analysis_columns:
+                    try:
+                        expected = analysis(df)
+                    except Exception:
+                        continue  # e.g. no coupling iterations in the log
+                    selected = parse_file_to_dataframe(filename, record_types=analysis_record_types(analysis))
+                    result = analysis(fill_ogs_context(selected))
+                    if analysis is analysis_simulation_termination:
+                        expected, result = expected.reset_index(drop=True), result.reset_index(drop=True)
+                    pd.testing.assert_frame_equal(result, expected, check_categorical=False)
+        # the coupled scheme line would otherwise be taken for a TimeStepSolutionTime record
+        selected = select_patterns(ogs_regexes(), {TimeStepSolutionTime})
+        self.assertEqual([pattern_class for _, pattern_class in selected], [None, TimeStepSolutionTime])
+
+    def test_parse_time_steps(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            logfile = os.path.join(tmpdir, 'out.log')
+            write_log(logfile, time_steps=20, ranks=3, coupling_iterations=2, processes=2, rejected_every=5)
+            df = fill_ogs_context(parse_file_to_dataframe(logfile))
+            for time_steps in [range(0, 3), range(5, 9), range(18, 40), [3, 7]]:
+                expected = df[df['time_step'].isin(time_steps)].dropna(axis=1, how='all').reset_index(drop=True)
+                result = parse_time_steps(logfile, time_steps, save_index=False).dropna(axis=1, how='all')
+                pd.testing.assert_frame_equal(result, expected[result.columns], check_categorical=False)
+            # the index is written next to the log by default, later calls load it without rescanning
+            self.assertFalse(os.path.exists(TimeStepIndex.sidecar(logfile)))
+            first = parse_time_steps(logfile, [3])
+            self.assertTrue(os.path.exists(TimeStepIndex.sidecar(logfile)))
+            pattern = time_step_index._time_step_start
+            with mock.patch.object(time_step_index, '_time_step_start', mock.Mock(wraps=pattern)) as scan:
+                pd.testing.assert_frame_equal(parse_time_steps(logfile, [3]), first)
+                self.assertEqual(TimeStepIndex.load(logfile).scanned_bytes, os.path.getsize(logfile))
+            scan.finditer.assert_not_called()
+
+            # the index of a growing log is extended
+            with open(logfile, 'rb') as file:
+                content = file.read()
+            with open(logfile, 'wb') as file:
+                file.write(content[:len(content) // 3])
+            self.assertLess(TimeStepIndex.load(logfile, save=True).time_step.max(), 20)
+            with open(logfile, 'ab') as file:
+                file.write(content[len(content) // 3:])
+            index = TimeStepIndex.load(logfile, save=True)
+            rebuilt = TimeStepIndex(logfile)
+            rebuilt.update()
+            np.testing.assert_array_equal(index.offset, rebuilt.offset)
+            np.testing.assert_array_equal(index.line, rebuilt.line)
+            self.assertEqual(sorted(set(index.time_step)), list(range(1, 21)))
+
+            model = ogs6py.OGS(INPUT_FILE="tests/tunnel_ogs6py.prj", PROJECT_FILE=os.path.join(tmpdir, "model.prj"))
+            pt = model.parse_out(logfile, filter="time_step_vs_iterations", time_steps=range(4, 7), reset_index=False)
+            self.assertEqual(sorted(pt.index.unique()), [4, 5, 6])
+
+    def test_maximum_lines_and_sampling(self):
+        filename = 'tests/parser/serial_convergence_long.txt'
+        df = parse_file_to_dataframe(filename, maximum_lines=100)
+        self.assertEqual(df['line'].max(), max(record.line for record in parse_file(filename, maximum_lines=100)))
+        self.assertLessEqual(df['line'].max(), 100)
+        self.assertEqual(len(df), len(parse_file_to_dataframe(filename).query('line <= 100')))
+        self.assertEqual(sum(len(chunk) for chunk in iter_records(filename, chunk_size=10, maximum_lines=100)), len(df))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            logfile = os.path.join(tmpdir, 'out.log')
+            number_of_lines = write_log(logfile, time_steps=20, ranks=2, rejected_every=5)
+            df = fill_ogs_context(parse_file_to_dataframe(logfile))
+            index = TimeStepIndex.load(logfile)
+            self.assertEqual(index.sample(stride=5), [1, 6, 11, 16])
+            self.assertEqual(index.sample(maximum_lines=number_of_lines), list(range(0, 21)))
+            self.assertEqual(index.sample(time_window=(0, 4 * 86400), stride=2), [1, 3])
+            head = index.sample(maximum_lines=number_of_lines // 2)
+            self.assertEqual(head, list(range(0, max(head) + 1)))
+            for time_steps in [index.sample(stride=3), head]:
+                expected = df[df['time_step'].isin(time_steps)].dropna(axis=1, how='all').reset_index(drop=True)
+                result = parse_time_steps(logfile, time_steps).dropna(axis=1, how='all')
+                pd.testing.assert_frame_equal(result, expected[result.columns], check_categorical=False)
+
+            model = ogs6py.OGS(INPUT_FILE="tests/tunnel_ogs6py.prj", PROJECT_FILE=os.path.join(tmpdir, "model.prj"))
+            pt = model.parse_out(logfile, filter="by_time_step", stride=5, reset_index=False)
+            self.assertEqual(sorted(pt.index.get_level_values('time_step').unique()), [1, 6, 11, 16])
+            # maximum_lines alone is a plain read of the head, without building an index
+            os.remove(TimeStepIndex.sidecar(logfile))
+            head = model.parse_out(logfile, maximum_lines=100, reset_index=False)
+            pd.testing.assert_frame_equal(head, fill_ogs_context(parse_file_to_dataframe(logfile, maximum_lines=100)))
+            self.assertFalse(os.path.exists(TimeStepIndex.sidecar(logfile)))
+
+            # stride and time_window can not be applied to compressed logs and logs without time steps
+            with open(logfile, 'rb') as file, gzip.open(logfile + '.gz', 'wb') as compressed:
+                compressed.write(file.read())
+            short = os.path.join(tmpdir, 'short.log')
+            shutil.copy('tests/parser/serial_convergence_short.txt', short)
+            for filename, options in [(logfile + '.gz', {}), (short, {}), (logfile, {'chunk_size': 100})]:
+                with self.assertWarnsRegex(UserWarning, 'stride and time_window are not applied'):
+                    pt = model.parse_out(filename, stride=5, **options)
+                self.assertGreater(len(pt), 0)
+
+    def test_fill_ogs_context_per_mpi_process(self):
+        na = pd.NA
+        df = pd.DataFrame({'mpi_process': [0, 1, 0, 1, 0, 1, 0],
+                           'time_step': [1, na, na, 2, na, na, 3],
+                           'iteration_number': [na, na, 1, na, na, 4, na],
+                           'coupling_iteration_process': [0, na, na, 1, na, na, na],
+                           'component': [na, 0, na, na, 1, na, na]}, dtype='Int64')
+        df = fill_ogs_context(df)
+        self.assertEqual(df['time_step'].tolist(), [1, 0, 1, 2, 1, 2, 3])
+        self.assertEqual(df['iteration_number'].tolist(), [1, 4, 1, 4, na, 4, na])
+        self.assertEqual(df['coupling_iteration_process'].tolist(), [0, na, 0, 1, na, 1, na])
+        self.assertEqual(df['component'].tolist(), [-1, 0, -1, -1, 1, -1, -1])
+
+    def test_log_analysis(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            logfile = os.path.join(tmpdir, 'out.log')
+            write_log(logfile, time_steps=6, ranks=2, coupling_iterations=2, processes=2, components=2,
+                      rejected_every=4)
+            for filename in ['tests/parser/serial_convergence_long.txt', logfile]:
+                df = fill_ogs_context(parse_file_to_dataframe(filename))
+                log = LogAnalysis(filename)
+                pd.testing.assert_frame_equal(log.time_step, analysis_time_step(df))
+                pd.testing.assert_frame_equal(log.time_step_vs_iterations, time_step_vs_iterations(df))
+                pd.testing.assert_frame_equal(log.convergence_newton_iteration,
+                                              analysis_convergence_newton_iteration(df))
+                pd.testing.assert_frame_equal(log.simulation, analysis_simulation(df))
+                pd.testing.assert_frame_equal(log.convergence_coupling_iteration,
+                                              analysis_convergence_coupling_iteration(df))
+                self.assertIs(log['by_time_step'], log.time_step)
+            write_log(logfile, time_steps=3)
+            with self.assertRaises(Exception):
+                LogAnalysis(logfile).convergence_coupling_iteration
+
+    def test_analysis_backends(self):
+        with self.assertRaises(Exception):
+            set_backend('spreadsheet')
+
+    def check_analysis_backend(self, backend):
+        df = fill_ogs_context(parse_file_to_dataframe('tests/parser/serial_convergence_long.txt'))
+        analyses = [analysis_time_step, analysis_convergence_newton_iteration, analysis_convergence_coupling_iteration,
+                    time_step_vs_iterations, analysis_simulation]
+        expected = [analysis(df) for analysis in analyses]
+        set_backend(backend)
+        try:
+            for analysis, result in zip(analyses, expected):
+                pd.testing.assert_frame_equal(analysis(df), result)
+        finally:
+            self.assertEqual(set_backend('pandas'), backend)
+
+    @unittest.skipIf(common_ogs_analyses.pa is None, 'pyarrow is not installed')
+    def test_analysis_backend_arrow(self):
+        self.check_analysis_backend('arrow')
+
+    @unittest.skipIf(common_ogs_analyses.pl is None, 'polars is not installed')
+    def test_analysis_backend_polars(self):
+        self.check_analysis_backend('polars')
+
+    def test_parse_logs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            logs = {}
+            for run in range(3):
+                logs['run{}'.format(run)] = os.path.join(directory, 'run{}.log'.format(run))
+                write_log(logs['run{}'.format(run)], time_steps=4 + run, ranks=1 + run % 2, seed=run)
+            logs['missing'] = os.path.join(directory, 'missing.log')
+            with self.assertWarns(RuntimeWarning):
+                df = parse_logs(logs, metadata={'run0': {'dt': 1.0}, 'run2': {'dt': 2.0}}, workers=2)
+            self.assertEqual(list(df.index.get_level_values('run_id').unique()), ['run0', 'run1', 'run2'])
+            self.assertEqual(list(df.attrs['errors']), ['missing'])
+            with self.assertRaises(Exception):
+                parse_logs(logs, workers=2, errors='raise')
+            self.assertEqual(df.xs('run2', level='run_id')['dt'].unique().tolist(), [2.0])
+            self.assertTrue(df.xs('run1', level='run_id')['dt'].isna().all())
+            by_run = analyse_runs(df, time_step_vs_iterations)
+            for run in ['run0', 'run1', 'run2']:
+                expected = time_step_vs_iterations(fill_ogs_context(parse_file_to_dataframe(logs[run])))
+                pd.testing.assert_frame_equal(by_run.xs(run, level='run_id'), expected)
+            self.assertEqual(list(by_run.attrs['errors']), ['missing'])
+            # no coupling iterations in these logs: no run is left out silently
+            by_run = analyse_runs(df, analysis_convergence_coupling_iteration)
+            self.assertTrue(by_run.empty)
+            self.assertEqual(sorted(by_run.attrs['errors']), ['missing', 'run0', 'run1', 'run2'])
+            with self.assertRaises(KeyError):
+                analyse_runs(df, lambda run: run['no_such_column'])
+            self.assertEqual(len(parse_logs(os.path.join(directory, 'run*.log')).index.levels[0]), 3)
+
+    def test_time_step_statistics(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'out.log')
+            write_log(filename, time_steps=12, ranks=3, rejected_every=4, coupling_iterations=2, processes=2)
+            df = fill_ogs_context(parse_file_to_dataframe(filename))
+            for chunk_size in [50, 1000]:
+                statistics = aggregate_time_steps(filename, chunk_size=chunk_size)
+                pd.testing.assert_frame_equal(statistics.time_step(), analysis_time_step(df))
+                pd.testing.assert_frame_equal(statistics.time_step_vs_iterations(), time_step_vs_iterations(df))
+                last_dx_x = df.groupby(['mpi_process', 'time_step'])[['dx_x']].last().dropna()
+                pd.testing.assert_frame_equal(statistics.last_dx_x(), last_dx_x)
+        with self.assertRaises(Exception):
+            TimeStepStatistics().time_step()
+
+    def test_log_monitor(self):
+        with tempfile.TemporaryDirectory() as directory:
+            generated = os.path.join(directory, 'generated.log')
+            write_log(generated, time_steps=150, ranks=2, seed=1)
+            # assembly of mpi_process 1 three times slower from time step 100 on
+            with open(generated) as file:
+                lines = file.readlines()
+            slow = [index for index, line in enumerate(lines)
+                    if line.startswith('[1] info: === Time stepping at step #100 ')][0]
+            for index in range(slow, len(lines)):
+                if lines[index].startswith('[1] info: [time] Assembly took'):
+                    seconds = float(lines[index].split()[-2])
+                    lines[index] = '[1] info: [time] Assembly took {:.6g} s.\n'.format(3 * seconds)
+            filename = os.path.join(directory, 'out.log')
+            with open(filename, 'w') as file:
+                file.writelines(lines[:slow])
+            events = []
+            monitor = LogMonitor(filename, callback=events.append)
+            self.assertEqual(monitor.update(), [])
+            with open(filename, 'a') as file:
+                file.writelines(lines[slow:])
+            anomalies = monitor.update() + monitor.flush()
+            self.assertEqual(anomalies, events)
+            self.assertEqual({(anomaly.kind, anomaly.quantity, anomaly.mpi_process) for anomaly in anomalies},
+                             {('threshold', 'assembly_time', 1), ('change_point', 'assembly_time', 1)})
+            self.assertTrue(all(anomaly.time_step >= 100 for anomaly in anomalies))
+        # jump of the newton iterations per time step
+        rows = [(time_step, iteration) for time_step in range(1, 60)
+                for iteration in range(1, (4 if time_step < 40 else 9) + 1)]
+        df = pd.DataFrame({'mpi_process': 0, 'time_step': [time_step for time_step, _ in rows],
+                           'line': range(1, len(rows) + 1), 'iteration_number': [iteration for _, iteration in rows],
+                           'iteration_time': 0.01})
+        anomalies = LogMonitor().push(df)
+        self.assertEqual([(anomaly.kind, anomaly.quantity, anomaly.time_step, anomaly.value) for anomaly in anomalies],
+                         [('change_point', 'iterations', 40, 9.0)])
+
+    def test_performance_breakdown(self):
+        df = fill_ogs_context(parse_file_to_dataframe('tests/parser/serial_time_step_rejected.txt'))
+        breakdown = analysis_performance_breakdown(df)
+        accounted = breakdown[['assembly_time', 'linear_solver_time', 'dirichlet_time', 'overhead_time']].sum(axis=1)
+        np.testing.assert_allclose(accounted, breakdown['time_step_finished_time'])
+        pd.testing.assert_series_equal(breakdown['time_step_finished_time'],
+                                       df.groupby(['mpi_process', 'time_step'])['time_step_finished_time'].sum()
+                                       .loc[breakdown.index])
+        self.assertNotIn(0, breakdown.index.get_level_values('time_step'))
+        report = performance_report(df, top=3)
+        self.assertAlmostEqual(report.totals.loc['total_time', 'seconds'], breakdown['total_time'].sum())
+        self.assertAlmostEqual(report.totals['share'].drop('total_time').sum(), 1.0)
+        self.assertEqual(list(report.top_time_steps['total_time']), sorted(breakdown['total_time'])[::-1][:3])
+        self.assertEqual(list(report.percentiles.index), [0.5, 0.9, 0.99, 'max'])
+        self.assertIn('Most expensive time steps', str(report))
+        pd.testing.assert_frame_equal(LogAnalysis(df=df)['performance_breakdown'], breakdown)
+
+    def test_mpi_imbalance(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'out.log')
+            write_log(filename, time_steps=5, ranks=3, seed=2)
+            with open(filename) as file:
+                lines = file.readlines()
+            # mpi_process 2 assembles twice as long
+            with open(filename, 'w') as file:
+                for line in lines:
+                    if line.startswith('[2] info: [time] Assembly took'):
+                        line = '[2] info: [time] Assembly took {:.6g} s.\n'.format(2 * float(line.split()[-2]))
+                    file.write(line)
+            df = fill_ogs_context(parse_file_to_dataframe(filename))
+        imbalance = analysis_mpi_imbalance(df)
+        self.assertEqual(list(imbalance.index), [1, 2, 3, 4, 5])
+        self.assertTrue((imbalance['assembly_time_slowest_rank'] == 2).all())
+        assembly = df.dropna(subset=['assembly_time'])
+        assembly = assembly.assign(occurrence=assembly.groupby(['mpi_process', 'time_step']).cumcount())
+        synchronized = assembly.groupby(['time_step', 'occurrence'])['assembly_time'].agg(['max', 'mean'])
+        np.testing.assert_allclose(imbalance['assembly_time_wait'],
+                                   (synchronized['max'] - synchronized['mean']).groupby(level='time_step').sum())
+        report = mpi_imbalance_report(df)
+        self.assertEqual(report.summary.loc['assembly_time', 'slowest_rank'], 2)
+        self.assertEqual(report.summary.loc['assembly_time', 'slowest_rank_frequency'], 1.0)
+        self.assertGreater(report.summary.loc['assembly_time', 'imbalance'], 1.2)
+        self.assertEqual(list(report.slowest_rank_frequency.index), [0, 1, 2])
+        serial = fill_ogs_context(parse_file_to_dataframe('tests/parser/serial_convergence_long.txt'))
+        serial = mpi_imbalance_report(serial)
+        self.assertTrue((serial.summary['wait_time'] == 0).all())
+
+    def test_convergence_order(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'out.log')
+            # |dx|/|x| of order 1.6, diverging in the rejected time steps
+            write_log(filename, time_steps=10, ranks=2, rejected_every=5, components=2, newton_iterations=5)
+            df = fill_ogs_context(parse_file_to_dataframe(filename))
+        order = analysis_convergence_order(df)
+        self.assertEqual(order.index.names, ['time_step', 'attempt', 'process', 'component'])
+        self.assertEqual(len(order), (10 + 2) * 2)
+        first_attempt = (order.index.get_level_values('attempt') == 0)
+        in_rejected = order.index.get_level_values('time_step').isin([5, 10]) & first_attempt
+        rejected, accepted = order[in_rejected], order[~in_rejected]
+        self.assertEqual(len(rejected), 4)
+        self.assertTrue((rejected['convergence'] == 'diverging').all() and rejected['flagged'].all())
+        self.assertTrue((accepted['convergence'] == 'superlinear').all() and not accepted['flagged'].any())
+        np.testing.assert_allclose(accepted['order'], 1.6, rtol=1e-3)
+        self.assertTrue((accepted['iterations'] == 5).all())
+
+        # linear convergence with a small contraction factor, not flagged
+        df = fill_ogs_context(parse_file_to_dataframe('tests/parser/serial_convergence_long.txt'))
+        order = analysis_convergence_order(df)
+        first = order.loc[(1, 0, 0, 0, -1)]
+        self.assertEqual(first['convergence'], 'linear')
+        self.assertAlmostEqual(first['order'], 1.0, places=2)
+        self.assertFalse(first['flagged'])
+        self.assertTrue(order['flagged'].any())
+
+    def test_wasted_compute(self):
+        df = fill_ogs_context(parse_file_to_dataframe('tests/parser/serial_time_step_rejected.txt'))
+        attempt = time_step_attempts(df)
+        self.assertEqual(attempt[df['line'] == 430].item(), 0)  # rejection warning of time step 6
+        self.assertEqual(attempt[df['line'] == 431].item(), 1)  # repeated start of time step 6
+        attempts = analysis_time_step_attempts(df)
+        self.assertEqual(attempts['rejected'].sum(), 4)  # as logged: 'the rejected steps are 4'
+        self.assertEqual(len(attempts), 25)
+        wasted = analysis_wasted_compute(df)
+        self.assertEqual(list(wasted.index.get_level_values('time_step')), [6, 10, 11, 14])
+        self.assertEqual(wasted.loc[(0, 6), 'time_step_finished_time'], 11.8274)
+        pd.testing.assert_frame_equal(LogAnalysis(df=df)['wasted_compute'], wasted)
+        report = wasted_compute_report(df)
+        self.assertAlmostEqual(report.totals.loc['linear_solver_time', 'wasted'],
+                               wasted['linear_solver_time'].sum())
+        pd.testing.assert_series_equal(report.totals['total'].drop('iterations'),
+                                       df[['assembly_time', 'linear_solver_time', 'dirichlet_time', 'iteration_time',
+                                           'time_step_finished_time']].sum().rename('total'), check_index_type=False)
+        # the last attempt of an aborted simulation is rejected by its warning
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'out.log')
+            write_log(filename, time_steps=4, ranks=2, rejected_every=2)
+            with open(filename) as file:
+                lines = file.readlines()
+            last_rejection = max(index for index, line in enumerate(lines) if 'was rejected' in line)
+            with open(filename, 'w') as file:
+                file.writelines(lines[:last_rejection + 1])
+            attempts = analysis_time_step_attempts(fill_ogs_context(parse_file_to_dataframe(filename)))
+        self.assertEqual(attempts[attempts['rejected']].index.droplevel('mpi_process').unique().tolist(),
+                         [(2, 0), (4, 0)])
+        # an attempt without 'Time step #n took' is kept and takes the time of its iterations
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'out.log')
+            write_log(filename, time_steps=4)
+            with open(filename) as file:
+                lines = [line for line in file if 'Time step #3 took' not in line]
+            with open(filename, 'w') as file:
+                file.writelines(lines)
+            attempts = analysis_time_step_attempts(fill_ogs_context(parse_file_to_dataframe(filename)))
+        self.assertEqual(len(attempts), 4)
+        self.assertEqual(attempts[~attempts['finished']].index.tolist(), [(0, 3, 0)])
+        self.assertEqual(attempts.loc[(0, 3, 0), 'time_step_finished_time'], attempts.loc[(0, 3, 0), 'iteration_time'])
+        self.assertGreater(attempts.loc[(0, 3, 0), 'iterations'], 0)
+
+    def test_compare_runs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            logs = {name: os.path.join(directory, name + '.log') for name in ['baseline', 'noise', 'slow_assembly']}
+            write_log(logs['baseline'], time_steps=40, seed=1, rejected_every=7)
+            write_log(logs['noise'], time_steps=40, seed=2, rejected_every=7)
+            with open(logs['noise']) as file:
+                lines = file.readlines()
+            with open(logs['slow_assembly'], 'w') as file:
+                for line in lines:
+                    if line.startswith('info: [time] Assembly took'):
+                        line = 'info: [time] Assembly took {:.6g} s.\n'.format(1.5 * float(line.split()[-2]))
+                    file.write(line)
+            comparison = compare_runs(logs)
+            self.assertEqual(comparison.baseline, 'baseline')
+            self.assertEqual(comparison.verdict, 'regression')
+            verdicts = comparison.table['verdict']
+            self.assertTrue((verdicts['noise'] == 'unchanged').all())
+            self.assertEqual(verdicts[verdicts != 'unchanged'].index.tolist(), [('slow_assembly', 'assembly_time')])
+            self.assertEqual(comparison.table.loc[('slow_assembly', 'assembly_time'), 'time_steps'], 40)
+            result = json.loads(json.dumps(comparison.to_dict()))
+            self.assertEqual(result['verdict'], 'regression')
+            self.assertEqual(len(result['results']), 2 * 7)
+            # improvement the other way round, frames of parse_logs as input
+            df = parse_logs({'slow_assembly': logs['slow_assembly'], 'noise': logs['noise']})
+            self.assertEqual(compare_runs(df).verdict, 'improvement')
+            # runs of the same distribution, output only every 20th time step: phases measured
+            # too rarely do not decide, the 7 phases tested do not add up to a false regression
+            sparse = {}
+            for seed in [1, 2]:
+                write_log(os.path.join(directory, 'dense.log'), time_steps=60, seed=seed)
+                sparse[seed] = os.path.join(directory, 'sparse{}.log'.format(seed))
+                with open(os.path.join(directory, 'dense.log')) as file, open(sparse[seed], 'w') as output:
+                    output.writelines(line for line in file if not line.startswith('info: [time] Output of timestep')
+                                      or int(line.split()[5]) % 20 == 0)
+            comparison = compare_runs([sparse[1], sparse[2]])
+            self.assertEqual(comparison.table.loc[(sparse[2], 'output_time'), 'verdict'], 'not measured')
+            self.assertEqual(comparison.table.loc[(sparse[2], 'total_time'), 'time_steps'], 60)
+            self.assertLess(comparison.table['p_value'].min(), 0.01)
+            self.assertEqual(comparison.verdict, 'unchanged')
+            # too few aligned time steps is no verdict of unchanged performance
+            short = os.path.join(directory, 'short.log')
+            write_log(short, time_steps=3, seed=2)
+            comparison = compare_runs([logs['baseline'], short])
+            self.assertTrue((comparison.table['verdict'] == 'insufficient').all())
+            self.assertEqual(comparison.verdict, 'insufficient')
+            self.assertEqual(compare_runs([logs['baseline']]).verdict, 'insufficient')
+            command = [sys.executable, '-m', 'ogs6py.log_parser.run_comparison', logs['baseline'], short]
+            root = os.path.dirname(os.path.dirname(os.path.abspath(ogs6py.__file__)))
+            self.assertEqual(subprocess.run(command, capture_output=True, cwd=root).returncode, 3)
+        self.assertEqual(signed_rank_test(np.zeros(10)), 1.0)
+        self.assertLess(signed_rank_test(np.full(20, 0.1)), 1e-4)
+
+
 if __name__ == '__main__':
     unittest.main()